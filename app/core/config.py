@@ -1,5 +1,6 @@
 """Application settings and configuration."""
 from functools import lru_cache
+from typing import List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -14,6 +15,7 @@ class Settings(BaseSettings):
     # Supabase Settings
     SUPABASE_URL: str
     SUPABASE_KEY: str
+    SUPABASE_MAX_WORKERS: int = 16
     
     # Database Settings
     DATABASE_URL: str
@@ -22,6 +24,29 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Catalog cache
+    CATALOG_TTL_SECONDS: int = 60
+    HTTP_CACHE_MAX_AGE: int = 10
+    
+    # Recommendations
+    RECOMMENDATIONS_TOP_K: int = 100
+    RECOMMENDATION_JOB_WORKERS: int = 4
+    RECOMMENDATION_JOB_HISTORY: int = 1000
+    RECOMMENDATION_CALLBACK_TIMEOUT: float = 10.0
+    # Hosts job callbacks may be sent to; callbacks are refused when empty
+    RECOMMENDATION_CALLBACK_HOSTS: List[str] = []
+    PREFERENCE_HALF_LIFE_DAYS: float = 30.0
+    SIMILARITY_DIR: str = "data/similarity"
+    SIMILARITY_TOP_N: int = 50
+    EMBEDDING_DIR: str = "data/embeddings"
+    EMBEDDING_DIMENSIONS: int = 256
+    RECOMMENDATION_BATCH_CHECKPOINT: str = "data/recommendation_batch.json"
+
+    # Event tracking
+    TRACKING_QUEUE_SIZE: int = 10000
+    TRACKING_BATCH_SIZE: int = 1000
+    TRACKING_FLUSH_SECONDS: float = 1.0
+    
     class Config:
         """Pydantic config."""
         env_file = ".env"
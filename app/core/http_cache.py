@@ -0,0 +1,42 @@
+"""HTTP caching helpers for conditional GET support."""
+import hashlib
+from typing import Dict, Iterable
+from fastapi import Request, Response
+from app.core.config import get_settings
+
+def make_etag(chunks: Iterable[bytes]) -> str:
+    """Build a strong ETag from a content hash."""
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        digest.update(chunk)
+    return f'"{digest.hexdigest()}"'
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    """Get the validator and freshness headers for a cacheable response."""
+    max_age = get_settings().HTTP_CACHE_MAX_AGE
+    return {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={max_age}, must-revalidate',
+    }
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Check whether the client's If-None-Match already holds this ETag."""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = [tag.strip() for tag in header.split(',')]
+    return '*' in candidates or any(
+        tag[2:] == etag if tag.startswith('W/') else tag == etag
+        for tag in candidates
+    )
+
+def not_modified(etag: str) -> Response:
+    """Build a bodyless 304 response for a matching ETag."""
+    return Response(status_code=304, headers=cache_headers(etag))
+
+def cached_json_response(request: Request, body: bytes, etag: str) -> Response:
+    """Send pre-serialized JSON, or a 304 when the client's copy is current."""
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return Response(content=body, media_type='application/json', headers=cache_headers(etag))
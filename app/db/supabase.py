@@ -1,5 +1,8 @@
 """Supabase client configuration."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+from typing import Any
 from supabase import create_client, Client
 from app.core.config import get_settings
 from dotenv import load_dotenv
@@ -17,6 +20,31 @@ def get_supabase() -> Client:
         )
     return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
 
+@lru_cache()
+def get_query_executor() -> ThreadPoolExecutor:
+    """Get the bounded thread pool that runs blocking Supabase requests.
+
+    The pool is kept below httpx's default of 20 keep-alive connections so
+    every worker thread reuses a pooled connection of the shared client.
+    """
+    settings = get_settings()
+    return ThreadPoolExecutor(
+        max_workers=settings.SUPABASE_MAX_WORKERS,
+        thread_name_prefix="supabase"
+    )
+
+def quote_filter_value(value: Any) -> str:
+    """Quote a value for use inside a PostgREST logical filter."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+async def execute(query: Any) -> Any:
+    """Execute a supabase-py query builder without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_query_executor(), query.execute)
+
 def get_supabase_client():
     """
     Crea y retorna una instancia del cliente de Supabase
@@ -3,6 +3,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import get_settings
 from app.routers import product, category, chat, recommendation
+from app.services.product_embeddings import product_embedding_index
+from app.services.tracking_buffer import tracking_buffer
 
 # Get settings
 settings = get_settings()
@@ -23,6 +25,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Include routers
@@ -31,6 +34,21 @@ app.include_router(category.router, prefix=settings.API_V1_STR)
 app.include_router(chat.router, prefix=settings.API_V1_STR)
 app.include_router(recommendation.router)
 
+@app.on_event("startup")
+async def load_models():
+    """Map the published product embeddings before serving requests."""
+    product_embedding_index.load()
+
+@app.on_event("startup")
+async def start_tracking():
+    """Start writing buffered tracking events in the background."""
+    await tracking_buffer.start()
+
+@app.on_event("shutdown")
+async def stop_tracking():
+    """Write every buffered tracking event before exiting."""
+    await tracking_buffer.stop()
+
 @app.get("/")
 async def root():
     """Root endpoint."""
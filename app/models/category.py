@@ -1,6 +1,6 @@
 """Category models."""
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 
 class CategoryBase(BaseModel):
@@ -24,4 +24,16 @@ class Category(CategoryBase):
 
     class Config:
         """Pydantic config."""
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class CategoryStats(BaseModel):
+    """Product aggregates of a category."""
+    product_count: int = 0
+    in_stock_count: int = 0
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    top_labels: List[str] = []
+
+class CategoryWithStats(Category):
+    """Category listing model with product aggregates."""
+    stats: CategoryStats = CategoryStats()
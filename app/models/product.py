@@ -42,4 +42,36 @@ class Product(BaseModel):
 
     class Config:
         """Pydantic config."""
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class ProductBulkItemResult(BaseModel):
+    """Outcome of one item in a bulk product creation."""
+    index: int
+    success: bool
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class ProductBulkResponse(BaseModel):
+    """Bulk product creation response model."""
+    created: int
+    failed: int
+    results: List[ProductBulkItemResult]
+
+class ProductFacets(BaseModel):
+    """Facet counts for a filtered set of products."""
+    labels: Dict[str, int] = Field(default_factory=dict)
+    categories: Dict[int, int] = Field(default_factory=dict)
+    in_stock: int = 0
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+class FacetedProductsResponse(BaseModel):
+    """Faceted product filtering response model."""
+    total: int
+    items: List[Product]
+    facets: ProductFacets
+
+class ProductSearchHit(BaseModel):
+    """Product search result with its relevance score."""
+    score: float
+    product: Product
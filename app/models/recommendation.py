@@ -1,9 +1,15 @@
 """Recommendation models."""
 from enum import Enum
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
+# Maximum product_recommendations rows sent or looked up in a single request
+RECOMMENDATION_CHUNK_SIZE = 500
+
+# Recommendation columns with the product name embedded through the foreign key
+RECOMMENDATION_WITH_NAME = 'product_id, recommendation_type, score, updated_at, products(name)'
+
 class RecommendationType(str, Enum):
     """Types of recommendations."""
     HIGHLY_RECOMMENDED = "highly_recommended"
@@ -28,6 +34,17 @@ class ProductRecommendationResponse(BaseModel):
     score: float
     updated_at: datetime
 
+    @classmethod
+    def from_row(cls, row: Dict) -> "ProductRecommendationResponse":
+        """Build a listing item from a row selected with RECOMMENDATION_WITH_NAME."""
+        return cls(
+            product_id=row['product_id'],
+            product_name=row['products']['name'],
+            recommendation_type=row['recommendation_type'],
+            score=row['score'],
+            updated_at=row['updated_at']
+        )
+
 class RecommendationListResponse(BaseModel):
     recommendations: List[ProductRecommendationResponse]
 
@@ -36,4 +53,35 @@ class UserRecommendations(BaseModel):
     highly_recommended: List[int] = Field(default_factory=list)
     recommended: List[int] = Field(default_factory=list)
     not_recommended: List[int] = Field(default_factory=list)
-    updated_at: Optional[datetime] = None
\ No newline at end of file
+    updated_at: Optional[datetime] = None
+
+class RecommendationWriteSummary(BaseModel):
+    """Outcome of a bulk recommendation write."""
+    scored: int
+    written: int
+    unchanged: int
+    elapsed_seconds: float
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a background job."""
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class RecommendationJob(BaseModel):
+    """Background recommendation generation job."""
+    job_id: str
+    user_id: int
+    status: JobStatus = JobStatus.PENDING
+    callback_url: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    summary: Optional[RecommendationWriteSummary] = None
+    error: Optional[str] = None
+
+class SimilarProduct(BaseModel):
+    """Product similar to another by shared user interactions."""
+    product_id: int
+    score: float
@@ -1,7 +1,14 @@
 """Category router."""
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.category import Category, CategoryCreate, CategoryUpdate
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from app.core.http_cache import (
+    cache_headers,
+    cached_json_response,
+    is_not_modified,
+    make_etag,
+    not_modified
+)
+from app.models.category import Category, CategoryCreate, CategoryUpdate, CategoryWithStats
 from app.services.category_service import CategoryService
 
 router = APIRouter(
@@ -13,13 +20,25 @@ async def get_category_service() -> CategoryService:
     """Dependency injection for CategoryService."""
     return CategoryService()
 
-@router.get("", response_model=List[Category])
-@router.get("/", response_model=List[Category])
+# The listing is returned pre-serialized, so its schema is documented here
+CATEGORY_LIST_RESPONSES = {
+    200: {"model": List[CategoryWithStats], "description": "Categories with product aggregates"},
+    304: {"description": "The listing matches If-None-Match"}
+}
+
+@router.get("", response_model=None, responses=CATEGORY_LIST_RESPONSES)
+@router.get("/", response_model=None, responses=CATEGORY_LIST_RESPONSES)
 async def list_categories(
+    request: Request,
     service: CategoryService = Depends(get_category_service)
-) -> List[Category]:
-    """Get all categories."""
-    return await service.list_categories()
+) -> Response:
+    """Get all categories with product aggregates, answering a matching If-None-Match with 304.
+
+    The listing is served pre-serialized and is only encoded again when
+    the categories or the catalog change.
+    """
+    payload = await service.get_category_list_payload()
+    return cached_json_response(request, payload.body, payload.etag)
 
 @router.post("", response_model=Category)
 @router.post("/", response_model=Category)
@@ -33,12 +52,18 @@ async def create_category(
 @router.get("/{category_id}", response_model=Category)
 async def get_category(
     category_id: int,
+    request: Request,
+    response: Response,
     service: CategoryService = Depends(get_category_service)
-) -> Category:
-    """Get a category by ID."""
+):
+    """Get a category by ID, answering a matching If-None-Match with 304."""
     category = await service.get_category(category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
+    etag = make_etag([category.model_dump_json().encode()])
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
     return category
 
 @router.put("/{category_id}", response_model=Category)
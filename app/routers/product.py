@@ -1,7 +1,24 @@
 """Product router."""
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.product import Product, ProductCreate, ProductUpdate
+import zlib
+from typing import AsyncIterator, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.core.http_cache import (
+    cache_headers,
+    cached_json_response,
+    is_not_modified,
+    make_etag,
+    not_modified
+)
+from app.models.product import (
+    FacetedProductsResponse,
+    Product,
+    ProductBulkResponse,
+    ProductCreate,
+    ProductSearchHit,
+    ProductUpdate
+)
 from app.services.product_service import ProductService
 
 router = APIRouter(
@@ -9,17 +26,86 @@ router = APIRouter(
     tags=["products"]
 )
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MAX_BULK_ITEMS = 5000
+EXPORT_CHUNK_SIZE = 500
+
+# The listing is returned as a prepared response, so its schema is documented here
+PRODUCT_LIST_RESPONSES = {
+    200: {
+        "description": "Products, or only the requested fields of each when `fields` is given",
+        "headers": {
+            "X-Next-Cursor": {
+                "description": "Cursor of the next page, absent on the last page",
+                "schema": {"type": "string"}
+            },
+            "ETag": {
+                "description": "Content hash of the listing or page",
+                "schema": {"type": "string"}
+            }
+        },
+        "content": {
+            "application/json": {
+                "schema": {
+                    "type": "array",
+                    "items": {
+                        "anyOf": [
+                            {"$ref": "#/components/schemas/Product"},
+                            {"type": "object", "description": "Requested fields of a product"}
+                        ]
+                    }
+                }
+            }
+        }
+    },
+    304: {"description": "The listing or page matches If-None-Match"}
+}
+
 async def get_product_service() -> ProductService:
     """Dependency injection for ProductService."""
     return ProductService()
 
-@router.get("", response_model=List[Product])
-@router.get("/", response_model=List[Product])
+@router.get("", response_model=None, responses=PRODUCT_LIST_RESPONSES)
+@router.get("/", response_model=None, responses=PRODUCT_LIST_RESPONSES)
 async def list_products(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
+    sort: Optional[str] = Query(None, pattern="^(id|price|name|stock)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields"),
     service: ProductService = Depends(get_product_service)
-) -> List[Product]:
-    """Get all products."""
-    return await service.list_products()
+) -> Response:
+    """Get all products, or one keyset page when paging parameters are given.
+
+    Pages are returned as a plain list; the cursor for the next page is sent
+    in the X-Next-Cursor header and is absent on the last page. The full
+    listing is served pre-serialized. Both carry an ETag and answer a
+    matching If-None-Match with 304.
+    """
+    if limit is None and after is None and sort is None and fields is None:
+        payload = (await service.get_catalog_payloads()).product_list
+        return cached_json_response(request, payload.body, payload.etag)
+
+    field_list = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+    try:
+        items, next_cursor = await service.list_products_page(
+            limit=limit or DEFAULT_PAGE_SIZE,
+            after=after,
+            sort=sort or 'id',
+            fields=field_list
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Pages are read from Supabase rather than the snapshot, so their ETag
+    # hashes the page itself together with its cursor
+    body = JSONResponse(content=jsonable_encoder(items)).body
+    etag = make_etag([body, (next_cursor or '').encode()])
+    response = cached_json_response(request, body, etag)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @router.post("", response_model=Product)
 @router.post("/", response_model=Product)
@@ -30,17 +116,118 @@ async def create_product(
     """Create a new product."""
     return await service.create_product(product)
 
+@router.post("/bulk", response_model=ProductBulkResponse)
+async def create_products_bulk(
+    products: List[ProductCreate],
+    service: ProductService = Depends(get_product_service)
+) -> ProductBulkResponse:
+    """Create many products at once, reporting the outcome of each item."""
+    if len(products) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_BULK_ITEMS} products can be created per request"
+        )
+    results = await service.create_products_bulk(products)
+    created = sum(1 for result in results if result.success)
+    return ProductBulkResponse(
+        created=created,
+        failed=len(results) - created,
+        results=results
+    )
+
+@router.get("/filter", response_model=FacetedProductsResponse)
+async def filter_products(
+    labels: List[str] = Query([]),
+    label_mode: str = Query("all", pattern="^(all|any)$"),
+    category_ids: List[int] = Query([]),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = False,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    service: ProductService = Depends(get_product_service)
+) -> FacetedProductsResponse:
+    """Filter products by labels, categories, price range and stock, with facet counts.
+
+    Labels are combined with AND (label_mode=all) or OR (label_mode=any);
+    several categories match any of them.
+    """
+    return await service.filter_products(
+        labels=labels,
+        match_all_labels=label_mode == "all",
+        category_ids=category_ids,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock_only=in_stock,
+        limit=limit,
+        offset=offset
+    )
+
+@router.get("/search", response_model=List[ProductSearchHit])
+async def search_products(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    service: ProductService = Depends(get_product_service)
+) -> List[ProductSearchHit]:
+    """Full-text product search, accent-insensitive and Spanish-aware."""
+    return await service.search_products(q, limit)
+
+@router.get("/export")
+async def export_products(
+    use_gzip: bool = Query(False, alias="gzip"),
+    service: ProductService = Depends(get_product_service)
+) -> StreamingResponse:
+    """Stream the whole catalog as NDJSON, one product per line."""
+    async def ndjson_lines() -> AsyncIterator[bytes]:
+        async for chunk in service.iter_product_chunks(EXPORT_CHUNK_SIZE):
+            yield b''.join(product.model_dump_json().encode() + b'\n' for product in chunk)
+
+    async def gzipped(lines: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        async for data in lines:
+            compressed = compressor.compress(data)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    headers = {'Content-Disposition': 'attachment; filename="products.ndjson"'}
+    body = ndjson_lines()
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+        body = gzipped(body)
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
 @router.get("/{product_id}", response_model=Product)
 async def get_product(
     product_id: int,
+    request: Request,
+    response: Response,
     service: ProductService = Depends(get_product_service)
-) -> Product:
-    """Get a product by ID."""
+):
+    """Get a product by ID, answering a matching If-None-Match with 304."""
+    payload = (await service.get_catalog_payloads()).product(product_id)
+    if payload:
+        return cached_json_response(request, payload.body, payload.etag)
+
+    # Not in the snapshot yet, e.g. created by another worker
     product = await service.get_product(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    etag = make_etag([product.model_dump_json().encode()])
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
     return product
 
+@router.get("/{product_id}/similar", response_model=List[ProductSearchHit])
+async def get_similar_products(
+    product_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    service: ProductService = Depends(get_product_service)
+) -> List[ProductSearchHit]:
+    """Get the products most similar in content to a product."""
+    return await service.get_similar_products(product_id, limit)
+
 @router.put("/{product_id}", response_model=Product)
 async def update_product(
     product_id: int,
@@ -66,10 +253,12 @@ async def delete_product(
 @router.get("/category/{category_id}", response_model=List[Product])
 async def list_products_by_category(
     category_id: int,
+    request: Request,
     service: ProductService = Depends(get_product_service)
-) -> List[Product]:
+):
     """Get all products in a specific category."""
-    return await service.get_products_by_category(category_id)
+    payload = (await service.get_catalog_payloads()).category(category_id)
+    return cached_json_response(request, payload.body, payload.etag)
 
 @router.get("/label/{label_name}", response_model=List[Product])
 async def list_products_by_label(
@@ -1,13 +1,18 @@
 """Recommendation router."""
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from app.models.recommendation import (
+    RecommendationJob,
+    RecommendationListResponse,
     RecommendationType,
     ProductRecommendation,
+    SimilarProduct,
     UserRecommendations
 )
 from app.services.recommendation_service import RecommendationService
-from app.services.ai_recommendation_service import AIRecommendationService
+from app.services.item_similarity import item_similarity_index
+from app.services.recommendation_jobs import recommendation_jobs
+from app.services.tracking_buffer import tracking_buffer
 
 router = APIRouter(
     prefix="/api/v1/recommendations",
@@ -18,68 +23,74 @@ async def get_recommendation_service() -> RecommendationService:
     """Dependency injection for RecommendationService."""
     return RecommendationService()
 
-async def get_ai_recommendation_service() -> AIRecommendationService:
-    """Dependency injection for AIRecommendationService."""
-    return AIRecommendationService()
-
-@router.post("/generate/{user_id}")
+@router.post("/generate/{user_id}", response_model=RecommendationJob, status_code=202)
 async def generate_recommendations(
     user_id: int,
-    service: AIRecommendationService = Depends(get_ai_recommendation_service)
-) -> dict:
-    """Generate AI-powered recommendations for a user."""
-    await service.generate_recommendations(user_id)
-    return {"message": "Recommendations generated successfully"}
-
-@router.post("/track/view/{user_id}/{product_id}")
-async def track_product_view(
-    user_id: int,
-    product_id: int,
-    service: AIRecommendationService = Depends(get_ai_recommendation_service)
-) -> dict:
-    """Track when a user views a product."""
-    result = service.supabase.table('user_views').upsert(
-        {
-            'user_id': user_id,
-            'product_id': product_id,
-            'viewed_at': 'now()',
-            'view_count': 1
-        },
-        on_conflict='(user_id,product_id)',
-        update_columns=['viewed_at', 'view_count']
-    ).execute()
-    
-    if not result.data:
-        raise HTTPException(status_code=400, detail="Failed to track product view")
-    
+    callback_url: Optional[str] = None
+) -> RecommendationJob:
+    """Start generating AI-powered recommendations for a user in the background.
+
+    Returns the job to poll, which is the already active one if the user has
+    a generation pending or running. When given, ``callback_url`` receives
+    the finished job as a JSON POST; it must be an http(s) URL on one of
+    the configured callback hosts.
+    """
+    try:
+        return recommendation_jobs.submit(user_id, callback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/jobs/{job_id}", response_model=RecommendationJob)
+async def get_recommendation_job(job_id: str) -> RecommendationJob:
+    """Get the status of a recommendation generation job."""
+    job = recommendation_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/track/view/{user_id}/{product_id}", status_code=202)
+async def track_product_view(user_id: int, product_id: int) -> dict:
+    """Track when a user views a product.
+
+    The view is buffered and written with others in the background.
+    """
+    await tracking_buffer.track_view(user_id, product_id)
     return {"message": "Product view tracked successfully"}
 
-@router.post("/track/purchase/{user_id}/{product_id}")
-async def track_product_purchase(
-    user_id: int,
-    product_id: int,
-    service: AIRecommendationService = Depends(get_ai_recommendation_service)
-) -> dict:
-    """Track when a user purchases a product."""
-    result = service.supabase.table('user_purchases').insert(
-        {
-            'user_id': user_id,
-            'product_id': product_id
-        }
-    ).execute()
-    
-    if not result.data:
-        raise HTTPException(status_code=400, detail="Failed to track product purchase")
-    
+@router.post("/track/purchase/{user_id}/{product_id}", status_code=202)
+async def track_product_purchase(user_id: int, product_id: int) -> dict:
+    """Track when a user purchases a product.
+
+    The purchase is buffered and written with others in the background.
+    """
+    await tracking_buffer.track_purchase(user_id, product_id)
     return {"message": "Product purchase tracked successfully"}
 
 @router.get("/user/{user_id}", response_model=UserRecommendations)
 async def get_user_recommendations(
     user_id: int,
+    limit: int = Query(12, ge=1, le=500),
+    tiers: Optional[List[RecommendationType]] = Query(None),
+    per_tier: Optional[int] = Query(None, ge=1),
     service: RecommendationService = Depends(get_recommendation_service)
 ) -> UserRecommendations:
-    """Get personalized recommendations for a user."""
-    return await service.get_user_recommendations(user_id)
+    """Get the top personalized recommendations for a user, grouped by tier.
+
+    ``limit`` caps the products across tiers, ``per_tier`` those of each
+    tier, and ``tiers`` restricts the response to the tiers asked for.
+    """
+    return await service.get_user_recommendations(user_id, limit, tiers, per_tier)
+
+@router.get("/similar/{product_id}", response_model=List[SimilarProduct])
+async def get_similar_products(
+    product_id: int,
+    limit: int = Query(10, ge=1, le=100)
+) -> List[SimilarProduct]:
+    """Get products often viewed or bought by the same users."""
+    return [
+        SimilarProduct(product_id=neighbour_id, score=score)
+        for neighbour_id, score in item_similarity_index.neighbours(product_id, limit)
+    ]
 
 @router.get("/product/{product_id}", response_model=ProductRecommendation)
 async def get_product_recommendation(
@@ -92,13 +103,28 @@ async def get_product_recommendation(
         raise HTTPException(status_code=404, detail="Recommendation not found")
     return recommendation
 
+@router.get("", response_model=RecommendationListResponse)
+@router.get("/", response_model=RecommendationListResponse)
+async def list_recommendations(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    recommendation_type: Optional[RecommendationType] = None,
+    service: RecommendationService = Depends(get_recommendation_service)
+) -> RecommendationListResponse:
+    """Get a page of product recommendations by descending score with product names."""
+    return RecommendationListResponse(
+        recommendations=await service.list_recommendations(limit, offset, recommendation_type)
+    )
+
 @router.get("/type/{recommendation_type}", response_model=List[ProductRecommendation])
 async def get_recommendations_by_type(
     recommendation_type: RecommendationType,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     service: RecommendationService = Depends(get_recommendation_service)
 ) -> List[ProductRecommendation]:
-    """Get all products with a specific recommendation type."""
-    return await service.get_recommendations_by_type(recommendation_type)
+    """Get a page of products with a specific recommendation type."""
+    return await service.get_recommendations_by_type(recommendation_type, limit, offset)
 
 @router.put("/product/{product_id}", response_model=ProductRecommendation)
 async def update_product_recommendation(
@@ -2,10 +2,90 @@
 from datetime import datetime
 from typing import List, Dict, Optional
 import numpy as np
+from app.core.config import get_settings
 from app.db.supabase import get_supabase
-from app.models.recommendation import RecommendationType
+from app.models.recommendation import RecommendationWriteSummary
+from app.services.catalog_columns import CatalogColumns
+from app.services.preference_profile_service import PreferenceProfileService, preferences_from_profile
 from app.services.product_service import ProductService
-from app.services.recommendation_service import RecommendationService
+from app.services.recommendation_service import RankedProducts, RecommendationService
+
+# Code that never equals a catalog code, used to pad preference arrays
+NO_MATCH = -2
+
+def _padded(rows: List[List[int]], fill: int) -> np.ndarray:
+    """Stack ragged rows of codes into a matrix, padding with a fill code."""
+    width = max((len(row) for row in rows), default=0)
+    matrix = np.full((len(rows), width), fill, dtype=np.int64)
+    for position, row in enumerate(rows):
+        matrix[position, :len(row)] = row
+    return matrix
+
+def calculate_content_scores(profiles: List[Dict], columns: CatalogColumns) -> np.ndarray:
+    """Calculate content-based similarity scores of many profiles at once.
+
+    Returns a profiles x products matrix. Terms are added in the same
+    order and with the same weights as the per-product rules (category
+    +0.3, +0.2 per shared label, price range +0.2, +0.1 per matching
+    spec), so every score is bit-for-bit what the scalar rules give.
+    """
+    profile_count = len(profiles)
+    scores = np.zeros((profile_count, columns.size))
+
+    # Category matching
+    categories = _padded([p.get('preferred_categories') or [] for p in profiles], NO_MATCH)
+    category_match = (columns.category[None, None, :] == categories[:, :, None]).any(axis=1)
+    scores += np.where(category_match, 0.3, 0.0)
+
+    # Label matching, adding one per preferred label over its products
+    link_rows = np.repeat(np.arange(columns.size), columns.label_counts)
+    link_order = np.argsort(columns.label_indices, kind='stable')
+    label_starts = np.searchsorted(
+        columns.label_indices[link_order], np.arange(len(columns.label_names) + 1)
+    )
+    matching_labels = np.zeros((profile_count, columns.size), dtype=np.int64)
+    for row, profile in enumerate(profiles):
+        for label in set(profile.get('preferred_labels') or []):
+            code = columns.label_codes.get(label)
+            if code is not None:
+                # A product has each label once, so its rows are distinct
+                label_rows = link_rows[link_order[label_starts[code]:label_starts[code + 1]]]
+                matching_labels[row, label_rows] += 1
+    scores += matching_labels * 0.2
+
+    # Price range matching
+    bounds = np.array([p.get('price_range') or (np.inf, -np.inf) for p in profiles], dtype=np.float64)
+    bounds = bounds.reshape(profile_count, 2)
+    price_match = (bounds[:, :1] <= columns.price) & (columns.price <= bounds[:, 1:])
+    scores += np.where(price_match, 0.2, 0.0)
+
+    # Specs matching, one preferred spec at a time as the scalar rule does
+    spec_keys, spec_values = [], []
+    for profile in profiles:
+        keys, values = [], []
+        for spec_key, spec_value in (profile.get('preferred_specs') or {}).items():
+            key_code = columns.spec_key_codes.get(spec_key)
+            value_code = columns.spec_value_codes[key_code].get(spec_value) if key_code is not None else None
+            keys.append(key_code if value_code is not None else 0)
+            values.append(value_code if value_code is not None else NO_MATCH)
+        spec_keys.append(keys)
+        spec_values.append(values)
+    spec_keys = _padded(spec_keys, 0)
+    spec_values = _padded(spec_values, NO_MATCH)
+    for position in range(spec_keys.shape[1] if columns.spec_keys else 0):
+        product_values = columns.spec_codes[:, spec_keys[:, position]].T
+        scores += np.where(product_values == spec_values[:, position:position + 1], 0.1, 0.0)
+
+    return np.minimum(scores, 1.0)
+
+def top_products(columns: CatalogColumns, scores: np.ndarray, limit: int) -> RankedProducts:
+    """Get the best scoring products, ordered by score then id."""
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+    ids = columns.ids[candidates]
+    order = np.lexsort((ids, -scores[candidates]))
+    return ids[order].tolist(), scores[candidates][order].tolist()
 
 class AIRecommendationService:
     """AI-powered recommendation service."""
@@ -15,155 +95,36 @@ class AIRecommendationService:
         self.supabase = get_supabase()
         self.product_service = ProductService()
         self.recommendation_service = RecommendationService()
-
-    async def _calculate_content_score(self, user_preferences: Dict, product_data: Dict) -> float:
-        """Calculate content-based similarity score."""
-        score = 0.0
-        
-        # Category matching
-        if user_preferences.get('preferred_categories'):
-            if product_data['category_id'] in user_preferences['preferred_categories']:
-                score += 0.3
-
-        # Label matching
-        if user_preferences.get('preferred_labels'):
-            matching_labels = set(product_data['labels']).intersection(
-                set(user_preferences['preferred_labels'])
-            )
-            score += len(matching_labels) * 0.2
-
-        # Price range matching
-        if user_preferences.get('price_range'):
-            min_price, max_price = user_preferences['price_range']
-            if min_price <= product_data['price'] <= max_price:
-                score += 0.2
-
-        # Specs matching
-        if user_preferences.get('preferred_specs'):
-            for spec_key, spec_value in user_preferences['preferred_specs'].items():
-                if product_data['specs'].get(spec_key) == spec_value:
-                    score += 0.1
-
-        return min(score, 1.0)
+        self.profile_service = PreferenceProfileService()
 
     async def _get_user_preferences(self, user_id: int) -> Dict:
-        """Get user preferences from interaction history."""
-        # Get user's purchase history
-        purchase_history = self.supabase.table('user_purchases')\
-            .select('product_id')\
-            .eq('user_id', user_id)\
-            .execute()
-
-        # Get user's viewed products
-        viewed_products = self.supabase.table('user_views')\
-            .select('product_id')\
-            .eq('user_id', user_id)\
-            .execute()
-
-        # Get details of interacted products
-        interacted_products = []
-        for product_id in [p['product_id'] for p in purchase_history.data + viewed_products.data]:
-            product = await self.product_service.get_product(product_id)
-            if product:
-                interacted_products.append(product)
-
-        if not interacted_products:
+        """Get user preferences from their incrementally updated profile."""
+        profile = await self.profile_service.get_profile(user_id)
+        if profile is None or not profile.get('backfilled'):
+            # History that predates the profile is folded in on first read
+            profile = await self.profile_service.build_from_history(user_id) or profile
+        if profile is None:
             return {}
+        return preferences_from_profile(profile)
 
-        # Extract preferences
-        preferences = {
-            'preferred_categories': [],
-            'preferred_labels': [],
-            'price_range': (0, 0),
-            'preferred_specs': {}
-        }
-
-        # Analyze product interactions to build preferences
-        prices = []
-        category_counts = {}
-        label_counts = {}
-        spec_counts = {}
-
-        for product in interacted_products:
-            # Track categories
-            if product.category_id:
-                category_counts[product.category_id] = category_counts.get(product.category_id, 0) + 1
-
-            # Track labels
-            for label in product.labels:
-                label_counts[label] = label_counts.get(label, 0) + 1
-
-            # Track prices
-            prices.append(product.price)
-
-            # Track specs
-            for key, value in product.specs.items():
-                if key not in spec_counts:
-                    spec_counts[key] = {}
-                spec_counts[key][value] = spec_counts[key].get(value, 0) + 1
-
-        # Set preferred categories (top 2)
-        preferences['preferred_categories'] = sorted(
-            category_counts.keys(),
-            key=lambda x: category_counts[x],
-            reverse=True
-        )[:2]
-
-        # Set preferred labels (top 3)
-        preferences['preferred_labels'] = sorted(
-            label_counts.keys(),
-            key=lambda x: label_counts[x],
-            reverse=True
-        )[:3]
-
-        # Set price range
-        if prices:
-            avg_price = np.mean(prices)
-            std_price = np.std(prices) if len(prices) > 1 else avg_price * 0.2
-            preferences['price_range'] = (
-                max(0, avg_price - std_price),
-                avg_price + std_price
-            )
-
-        # Set preferred specs (most common value for each key)
-        for spec_key, value_counts in spec_counts.items():
-            most_common = max(value_counts.items(), key=lambda x: x[1])[0]
-            preferences['preferred_specs'][spec_key] = most_common
-
-        return preferences
-
-    async def generate_recommendations(self, user_id: int) -> None:
+    async def generate_recommendations(self, user_id: int) -> RecommendationWriteSummary:
         """Generate AI-powered recommendations for a user."""
+        return await self.generate_recommendations_bulk([user_id])
+
+    async def generate_recommendations_bulk(self, user_ids: List[int]) -> RecommendationWriteSummary:
+        """Generate and store the top recommendations of several users."""
         # Get user preferences
-        user_preferences = await self._get_user_preferences(user_id)
-
-        # Get all products
-        products = await self.product_service.list_products()
-
-        # Calculate scores for each product
-        for product in products:
-            product_data = {
-                'id': product.id,
-                'category_id': product.category_id,
-                'labels': product.labels,
-                'price': product.price,
-                'specs': product.specs or {}
-            }
-
-            # Calculate content-based score
-            score = await self._calculate_content_score(user_preferences, product_data)
-
-            # Determine recommendation type based on score
-            if score >= 0.7:
-                rec_type = RecommendationType.HIGHLY_RECOMMENDED
-            elif score >= 0.4:
-                rec_type = RecommendationType.RECOMMENDED
-            else:
-                rec_type = RecommendationType.NOT_RECOMMENDED
-
-            # Update recommendation in database
-            await self.recommendation_service.update_product_recommendation(
-                product_id=product.id,
-                recommendation_type=rec_type,
-                score=score
-            ) 
\ No newline at end of file
+        profiles = [await self._get_user_preferences(user_id) for user_id in user_ids]
+
+        # Get the columnar catalog
+        columns = await self.product_service.get_catalog_columns()
+
+        # Calculate scores of every user for every product in one pass
+        scores = calculate_content_scores(profiles, columns)
+
+        # Keep each user's top products and store them in bulk
+        limit = get_settings().RECOMMENDATIONS_TOP_K
+        return await self.recommendation_service.save_user_recommendations({
+            user_id: top_products(columns, user_scores, limit)
+            for user_id, user_scores in zip(user_ids, scores)
+        })
@@ -0,0 +1,218 @@
+"""In-process catalog snapshot with stale-while-revalidate refresh."""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import get_settings
+from app.models.product import Product
+
+logger = logging.getLogger(__name__)
+
+CatalogLoader = Callable[[], Awaitable[List[Product]]]
+
+class CatalogSnapshot:
+    """Immutable, versioned view of the product catalog."""
+
+    def __init__(self, products: List[Product], version: int):
+        """Index products by id and by category."""
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.products: Dict[int, Product] = {p.id: p for p in products}
+        self.by_category: Dict[int, List[int]] = {}
+        for product in self.products.values():
+            self.by_category.setdefault(product.category_id, []).append(product.id)
+        self._derived: Dict[str, Any] = {}
+
+    def derive(self, key: str, build: Callable[["CatalogSnapshot"], Any]) -> Any:
+        """Get data computed from this snapshot, building it on first use.
+
+        Derived data lives as long as the snapshot, so it is rebuilt exactly
+        once per catalog version.
+        """
+        if key not in self._derived:
+            self._derived[key] = build(self)
+        return self._derived[key]
+
+    def list(self) -> List[Product]:
+        """Get all products in the snapshot."""
+        return list(self.products.values())
+
+    def get(self, product_id: int) -> Optional[Product]:
+        """Get a product from the snapshot by ID."""
+        return self.products.get(product_id)
+
+    def in_category(self, category_id: int) -> List[Product]:
+        """Get the products of a category from the snapshot."""
+        return [self.products[i] for i in self.by_category.get(category_id, [])]
+
+class CatalogCache:
+    """Holds the current catalog snapshot and refreshes it in the background.
+
+    Reads never wait on Supabase once a snapshot exists: an expired snapshot
+    is served while a single background task reloads it, and a failed reload
+    keeps the previous snapshot. Writes made in this process are applied to
+    the snapshot immediately through ``put`` and ``remove``.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        """Initialize an empty cache."""
+        self._ttl = ttl
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        self._invalidated = False
+        self._lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Local writes made while each in-flight load runs, None for a removal
+        self._pending_writes: List[Dict[int, Optional[Product]]] = []
+
+    @property
+    def ttl(self) -> float:
+        """Seconds a snapshot is served before a background refresh starts."""
+        if self._ttl is None:
+            self._ttl = get_settings().CATALOG_TTL_SECONDS
+        return self._ttl
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Lock serializing snapshot loads, created on the running loop."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """Current snapshot, if one has been loaded."""
+        return self._snapshot
+
+    async def get(self, loader: CatalogLoader) -> CatalogSnapshot:
+        """Get the current snapshot, loading or refreshing it as needed."""
+        snapshot = self._snapshot
+        if snapshot is None or self._invalidated:
+            return await self._load(loader)
+
+        if time.monotonic() - snapshot.loaded_at >= self.ttl:
+            self._schedule_refresh(loader)
+        return snapshot
+
+    def put(self, product: Product) -> None:
+        """Apply a created or updated product to the current snapshot."""
+        self._record(product.id, product)
+        if self._snapshot is None:
+            return
+        products = dict(self._snapshot.products)
+        products[product.id] = product
+        self._replace(list(products.values()), keep_loaded_at=True)
+
+    def remove(self, product_id: int) -> None:
+        """Drop a deleted product from the current snapshot."""
+        self._record(product_id, None)
+        if self._snapshot is None or product_id not in self._snapshot.products:
+            return
+        products = dict(self._snapshot.products)
+        del products[product_id]
+        self._replace(list(products.values()), keep_loaded_at=True)
+
+    def invalidate(self) -> None:
+        """Force the next read to reload the catalog from Supabase."""
+        self._invalidated = True
+
+    async def _load(self, loader: CatalogLoader) -> CatalogSnapshot:
+        """Load the catalog in the foreground, one caller at a time."""
+        async with self.lock:
+            if self._snapshot is not None and not self._invalidated:
+                return self._snapshot
+            try:
+                products = await self._fetch(loader)
+            except Exception:
+                # Serve the last good snapshot while Supabase is unavailable
+                if self._snapshot is None:
+                    raise
+                logger.exception("Catalog reload failed, serving stale snapshot")
+                self._invalidated = False
+                self._snapshot.loaded_at = float("-inf")
+                return self._snapshot
+            self._invalidated = False
+            return self._replace(self._reuse_unchanged(products))
+
+    def _schedule_refresh(self, loader: CatalogLoader) -> None:
+        """Start a background refresh unless one is already running."""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(
+            self._refresh(loader)
+        )
+
+    async def _refresh(self, loader: CatalogLoader) -> None:
+        """Reload the catalog, keeping the stale snapshot on failure."""
+        try:
+            products = await self._fetch(loader)
+        except Exception:
+            logger.exception("Background catalog refresh failed")
+            return
+        async with self.lock:
+            current = self._snapshot
+            products = self._reuse_unchanged(products)
+            if current is not None and _same_products(current, products):
+                # Nothing changed, keep the version so derived data stays valid
+                current.loaded_at = time.monotonic()
+            else:
+                self._replace(products)
+
+    def _record(self, product_id: int, product: Optional[Product]) -> None:
+        """Remember a local write for every load in flight."""
+        for writes in self._pending_writes:
+            writes[product_id] = product
+
+    async def _fetch(self, loader: CatalogLoader) -> List[Product]:
+        """Load the catalog and apply the local writes made meanwhile.
+
+        The loaded rows may predate a write made in this process while the
+        load ran, whether or not that write changed the current snapshot.
+        """
+        writes: Dict[int, Optional[Product]] = {}
+        self._pending_writes.append(writes)
+        try:
+            products = await loader()
+        finally:
+            self._pending_writes = [w for w in self._pending_writes if w is not writes]
+        if not writes:
+            return products
+        loaded = {p.id: p for p in products}
+        for product_id, product in writes.items():
+            if product is None:
+                loaded.pop(product_id, None)
+            else:
+                loaded[product_id] = product
+        return list(loaded.values())
+
+    def _reuse_unchanged(self, products: List[Product]) -> List[Product]:
+        """Keep the existing objects for products a reload did not change.
+
+        Unchanged products stay identical across versions, so consumers that
+        maintain incremental indexes can find what changed by identity.
+        """
+        if self._snapshot is None:
+            return products
+        current = self._snapshot.products
+        return [
+            current[p.id] if current.get(p.id) == p else p
+            for p in products
+        ]
+
+    def _replace(self, products: List[Product], keep_loaded_at: bool = False) -> CatalogSnapshot:
+        """Publish a new snapshot version."""
+        self._version += 1
+        snapshot = CatalogSnapshot(products, self._version)
+        if keep_loaded_at and self._snapshot is not None:
+            snapshot.loaded_at = self._snapshot.loaded_at
+        self._snapshot = snapshot
+        return snapshot
+
+def _same_products(snapshot: CatalogSnapshot, products: List[Product]) -> bool:
+    """Check whether a freshly loaded catalog matches a snapshot."""
+    if len(products) != len(snapshot.products):
+        return False
+    return all(snapshot.products.get(p.id) is p for p in products)
+
+# Create singleton instance
+catalog_cache = CatalogCache()
@@ -0,0 +1,339 @@
+"""Columnar NumPy representation of the product catalog."""
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from app.models.category import CategoryStats
+from app.models.product import Product
+from app.services.catalog_cache import CatalogSnapshot
+
+# Code used for a missing category or spec value
+MISSING = -1
+# Labels reported per category in the category aggregates
+TOP_CATEGORY_LABELS = 5
+# Arrays published for scoring in other processes, vocabularies included
+SCORING_ARRAYS = (
+    'ids', 'price', 'category', 'label_indptr', 'label_indices', 'spec_codes',
+    'label_names', 'spec_keys', 'spec_value_indptr', 'spec_value_names'
+)
+
+class CatalogColumns:
+    """Compact column store of the catalog for scoring and analytics.
+
+    Scalar attributes are one NumPy array per column with a row per
+    product. Labels form a sparse product x label matrix in CSR layout
+    (``label_indptr``/``label_indices``) and specs an encoded product x spec
+    key matrix of value codes, ``MISSING`` where a product lacks the key.
+    Label, spec key and spec value vocabularies only ever grow, so codes
+    stay valid across versions.
+    """
+
+    def __init__(self):
+        """Initialize an empty column store."""
+        self.version: Optional[int] = None
+        self.products: Dict[int, Product] = {}
+        self.row_of: Dict[int, int] = {}
+        self.ids = np.empty(0, dtype=np.int64)
+        self.price = np.empty(0, dtype=np.float64)
+        self.stock = np.empty(0, dtype=np.int64)
+        self.category = np.empty(0, dtype=np.int64)
+        self.rating = np.empty(0, dtype=np.float64)
+        self.description_length = np.empty(0, dtype=np.int64)
+        self.label_names: List[str] = []
+        self.label_codes: Dict[str, int] = {}
+        self.label_rows: List[np.ndarray] = []
+        self.label_indptr = np.zeros(1, dtype=np.int64)
+        self.label_indices = np.empty(0, dtype=np.int32)
+        self.spec_keys: List[str] = []
+        self.spec_key_codes: Dict[str, int] = {}
+        self.spec_values: List[List[str]] = []
+        self.spec_value_codes: List[Dict[str, int]] = []
+        self.spec_codes = np.empty((0, 0), dtype=np.int32)
+
+    @property
+    def size(self) -> int:
+        """Number of products in the store."""
+        return len(self.ids)
+
+    @property
+    def label_counts(self) -> np.ndarray:
+        """Number of labels of each product."""
+        return np.diff(self.label_indptr)
+
+    @property
+    def spec_counts(self) -> np.ndarray:
+        """Number of specs of each product."""
+        return (self.spec_codes != MISSING).sum(axis=1)
+
+    @classmethod
+    def from_products(cls, products: Iterable[Product], version: Optional[int] = None) -> "CatalogColumns":
+        """Build a column store from a list of products."""
+        columns = cls()
+        columns._rebuild(list(products), version)
+        return columns
+
+    @classmethod
+    def for_snapshot(cls, snapshot: CatalogSnapshot) -> "CatalogColumns":
+        """Get the columns of a snapshot, built once per catalog version."""
+        return snapshot.derive('columns', catalog_columns.sync)
+
+    @classmethod
+    def from_scoring_arrays(cls, arrays: Dict[str, np.ndarray]) -> "CatalogColumns":
+        """Build a store for scoring from published, possibly mapped, arrays.
+
+        Only the columns and vocabularies content scoring and ranking read
+        are set, so the store cannot be updated or used for analytics.
+        """
+        columns = cls()
+        for name in ('ids', 'price', 'category', 'label_indptr', 'label_indices', 'spec_codes'):
+            setattr(columns, name, arrays[name])
+        columns.label_names = arrays['label_names'].tolist()
+        columns.label_codes = {name: code for code, name in enumerate(columns.label_names)}
+        columns.spec_keys = arrays['spec_keys'].tolist()
+        columns.spec_key_codes = {key: code for code, key in enumerate(columns.spec_keys)}
+        value_indptr = arrays['spec_value_indptr']
+        columns.spec_values = [
+            arrays['spec_value_names'][value_indptr[code]:value_indptr[code + 1]].tolist()
+            for code in range(len(columns.spec_keys))
+        ]
+        columns.spec_value_codes = [
+            {value: code for code, value in enumerate(values)} for values in columns.spec_values
+        ]
+        return columns
+
+    def scoring_arrays(self) -> Dict[str, np.ndarray]:
+        """Get the arrays content scoring and ranking read, keyed by ``SCORING_ARRAYS`` name."""
+        value_counts = [len(values) for values in self.spec_values]
+        return {
+            'ids': self.ids,
+            'price': self.price,
+            'category': self.category,
+            'label_indptr': self.label_indptr,
+            'label_indices': self.label_indices,
+            'spec_codes': self.spec_codes,
+            'label_names': np.array(self.label_names, dtype=str),
+            'spec_keys': np.array(self.spec_keys, dtype=str),
+            'spec_value_indptr': np.concatenate([[0], np.cumsum(value_counts)]).astype(np.int64),
+            'spec_value_names': np.array(
+                [value for values in self.spec_values for value in values], dtype=str
+            ),
+        }
+
+    def updated(self, snapshot: CatalogSnapshot) -> "CatalogColumns":
+        """Get a store for a newer snapshot, re-encoding only changed products.
+
+        Products are compared by identity with the snapshot this store was
+        built from. Arrays and vocabularies are copied before they are
+        patched, so a store already handed out is never modified.
+        """
+        if snapshot.version == self.version:
+            return self
+        current = snapshot.products
+        changed = [p for i, p in current.items() if self.products.get(i) is not p]
+        removed = [i for i in self.products if i not in current]
+        if len(changed) + len(removed) > max(self.size // 4, 1):
+            return CatalogColumns.from_products(current.values(), snapshot.version)
+
+        columns = self._copy()
+        columns.version = snapshot.version
+        columns.products = current
+        if removed:
+            columns._remove_rows([self.row_of[i] for i in removed])
+        added = [p for p in changed if p.id not in columns.row_of]
+        if added:
+            columns._append_rows(len(added))
+            for offset, product in enumerate(added):
+                columns.row_of[product.id] = columns.size - len(added) + offset
+        for product in changed:
+            columns._encode_row(columns.row_of[product.id], product)
+        columns._pack_labels()
+        return columns
+
+    def labels_of(self, row: int) -> List[str]:
+        """Get the label names of a row."""
+        return [self.label_names[code] for code in self.label_rows[row]]
+
+    def specs_of(self, row: int) -> Dict[str, str]:
+        """Get the specs of a row."""
+        return {
+            self.spec_keys[key_code]: self.spec_values[key_code][value_code]
+            for key_code, value_code in enumerate(self.spec_codes[row])
+            if value_code != MISSING
+        }
+
+    def feature_matrix(self) -> np.ndarray:
+        """Get the per-product features used by the global scorer.
+
+        Columns are price, description length, rating, stock, spec count and
+        label count, in that order.
+        """
+        return np.column_stack([
+            self.price,
+            self.description_length,
+            self.rating,
+            self.stock,
+            self.spec_counts,
+            self.label_counts,
+        ]).astype(np.float64)
+
+    def category_stats(self, top_labels: int = TOP_CATEGORY_LABELS) -> Dict[int, CategoryStats]:
+        """Aggregate product counts, prices and top labels per category."""
+        if not self.size:
+            return {}
+        category_ids, inverse = np.unique(self.category, return_inverse=True)
+        count = len(category_ids)
+        product_counts = np.bincount(inverse, minlength=count)
+        in_stock_counts = np.bincount(inverse, weights=self.stock > 0, minlength=count)
+        min_prices = np.full(count, np.inf)
+        np.minimum.at(min_prices, inverse, self.price)
+        max_prices = np.full(count, -np.inf)
+        np.maximum.at(max_prices, inverse, self.price)
+
+        # Count (category, label) pairs straight from the CSR layout
+        vocabulary = len(self.label_names)
+        label_categories = np.repeat(inverse, self.label_counts)
+        label_counts = np.bincount(
+            label_categories * vocabulary + self.label_indices,
+            minlength=count * vocabulary
+        ).reshape(count, vocabulary)
+
+        stats = {}
+        for position, category_id in enumerate(category_ids.tolist()):
+            if category_id == MISSING:
+                continue
+            counts = label_counts[position]
+            best = np.argsort(-counts, kind='stable')[:top_labels]
+            stats[category_id] = CategoryStats(
+                product_count=int(product_counts[position]),
+                in_stock_count=int(in_stock_counts[position]),
+                min_price=float(min_prices[position]),
+                max_price=float(max_prices[position]),
+                top_labels=[self.label_names[code] for code in best.tolist() if counts[code]]
+            )
+        return stats
+
+    def _rebuild(self, products: List[Product], version: Optional[int]) -> None:
+        """Encode every product from scratch."""
+        self.version = version
+        self.products = {p.id: p for p in products}
+        self.row_of = {}
+        self.label_rows = []
+        self._append_rows(len(products))
+        for row, product in enumerate(products):
+            self.row_of[product.id] = row
+            self._encode_row(row, product)
+        self._pack_labels()
+
+    def _encode_row(self, row: int, product: Product) -> None:
+        """Write a product's attributes into its row."""
+        self.ids[row] = product.id
+        self.price[row] = product.price
+        self.stock[row] = product.stock
+        self.category[row] = product.category_id if product.category_id is not None else MISSING
+        self.rating[row] = product.rating or 0.0
+        self.description_length[row] = len(product.description or '')
+        self.label_rows[row] = np.array(
+            sorted({self._label_code(label) for label in product.labels or []}),
+            dtype=np.int32
+        )
+        self.spec_codes[row] = MISSING
+        for key, value in (product.specs or {}).items():
+            key_code = self._spec_key_code(key)
+            self.spec_codes[row, key_code] = self._spec_value_code(key_code, value)
+
+    def _label_code(self, name: str) -> int:
+        """Get the code of a label, adding it to the vocabulary if needed."""
+        if name not in self.label_codes:
+            self.label_codes[name] = len(self.label_names)
+            self.label_names.append(name)
+        return self.label_codes[name]
+
+    def _spec_key_code(self, key: str) -> int:
+        """Get the code of a spec key, adding a matrix column if needed."""
+        if key not in self.spec_key_codes:
+            self.spec_key_codes[key] = len(self.spec_keys)
+            self.spec_keys.append(key)
+            self.spec_values.append([])
+            self.spec_value_codes.append({})
+            new_column = np.full((self.size, 1), MISSING, dtype=np.int32)
+            self.spec_codes = np.hstack([self.spec_codes, new_column])
+        return self.spec_key_codes[key]
+
+    def _spec_value_code(self, key_code: int, value: str) -> int:
+        """Get the code of a spec value within its key."""
+        codes = self.spec_value_codes[key_code]
+        if value not in codes:
+            codes[value] = len(self.spec_values[key_code])
+            self.spec_values[key_code].append(value)
+        return codes[value]
+
+    def _append_rows(self, count: int) -> None:
+        """Grow every column by some empty rows."""
+        self.ids = np.concatenate([self.ids, np.zeros(count, dtype=np.int64)])
+        self.price = np.concatenate([self.price, np.zeros(count, dtype=np.float64)])
+        self.stock = np.concatenate([self.stock, np.zeros(count, dtype=np.int64)])
+        self.category = np.concatenate([self.category, np.full(count, MISSING, dtype=np.int64)])
+        self.rating = np.concatenate([self.rating, np.zeros(count, dtype=np.float64)])
+        self.description_length = np.concatenate(
+            [self.description_length, np.zeros(count, dtype=np.int64)]
+        )
+        self.spec_codes = np.vstack([
+            self.spec_codes,
+            np.full((count, len(self.spec_keys)), MISSING, dtype=np.int32)
+        ])
+        self.label_rows.extend(np.empty(0, dtype=np.int32) for _ in range(count))
+
+    def _remove_rows(self, rows: List[int]) -> None:
+        """Drop rows from every column and renumber the remaining ones."""
+        keep = np.ones(self.size, dtype=bool)
+        keep[rows] = False
+        self.ids = self.ids[keep]
+        self.price = self.price[keep]
+        self.stock = self.stock[keep]
+        self.category = self.category[keep]
+        self.rating = self.rating[keep]
+        self.description_length = self.description_length[keep]
+        self.spec_codes = self.spec_codes[keep]
+        self.label_rows = [codes for codes, kept in zip(self.label_rows, keep) if kept]
+        self.row_of = {int(product_id): row for row, product_id in enumerate(self.ids)}
+
+    def _pack_labels(self) -> None:
+        """Rebuild the CSR label matrix from the per-row label codes."""
+        counts = np.fromiter((len(codes) for codes in self.label_rows), dtype=np.int64, count=self.size)
+        self.label_indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.label_indices = (
+            np.concatenate(self.label_rows).astype(np.int32)
+            if self.label_rows else np.empty(0, dtype=np.int32)
+        )
+
+    def _copy(self) -> "CatalogColumns":
+        """Copy the store so patches do not affect the original."""
+        columns = CatalogColumns()
+        columns.row_of = dict(self.row_of)
+        for name in ('ids', 'price', 'stock', 'category', 'rating', 'description_length', 'spec_codes'):
+            setattr(columns, name, getattr(self, name).copy())
+        columns.label_rows = list(self.label_rows)
+        # Vocabularies grow as the copy is patched, so it gets its own
+        columns.label_names = list(self.label_names)
+        columns.label_codes = dict(self.label_codes)
+        columns.spec_keys = list(self.spec_keys)
+        columns.spec_key_codes = dict(self.spec_key_codes)
+        columns.spec_values = [list(values) for values in self.spec_values]
+        columns.spec_value_codes = [dict(codes) for codes in self.spec_value_codes]
+        return columns
+
+class CatalogColumnStore:
+    """Keeps the column store in step with the catalog snapshot."""
+
+    def __init__(self):
+        """Initialize without columns."""
+        self.columns: Optional[CatalogColumns] = None
+
+    def sync(self, snapshot: CatalogSnapshot) -> CatalogColumns:
+        """Get columns for a snapshot, updating the previous ones incrementally."""
+        if self.columns is None:
+            self.columns = CatalogColumns.from_products(snapshot.products.values(), snapshot.version)
+        else:
+            self.columns = self.columns.updated(snapshot)
+        return self.columns
+
+# Create singleton instance
+catalog_columns = CatalogColumnStore()
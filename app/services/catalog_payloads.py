@@ -0,0 +1,81 @@
+"""Pre-serialized JSON bodies for catalog read endpoints."""
+from typing import Dict, Iterable, NamedTuple, Optional
+from pydantic import TypeAdapter
+from app.core.http_cache import make_etag
+from app.models.product import Product
+from app.services.catalog_cache import CatalogSnapshot
+
+_PRODUCT_ADAPTER = TypeAdapter(Product)
+
+class JsonPayload(NamedTuple):
+    """Serialized response body with its ETag."""
+    body: bytes
+    etag: str
+
+def _payload(body: bytes) -> JsonPayload:
+    """Wrap a serialized body with its content-hash ETag."""
+    return JsonPayload(body, make_etag([body]))
+
+def _json_array(items: Iterable[bytes]) -> bytes:
+    """Join already serialized JSON values into a JSON array."""
+    return b'[' + b','.join(items) + b']'
+
+class CatalogPayloads:
+    """JSON bodies for one catalog snapshot, serialized once.
+
+    Each product is encoded once with pydantic's native JSON serializer;
+    the full listing and per-category listings are byte-joins of those
+    encodings, so routes can return them without validating or encoding
+    any model per request. Products whose object is unchanged from the
+    previous version keep that version's encoding.
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot, previous: Optional["CatalogPayloads"] = None):
+        """Serialize the products of the snapshot not already serialized."""
+        self._snapshot = snapshot
+        previous_products = previous._snapshot.products if previous is not None else {}
+        self._products: Dict[int, JsonPayload] = {
+            product_id: (
+                previous._products[product_id]
+                if previous_products.get(product_id) is product
+                else _payload(_PRODUCT_ADAPTER.dump_json(product))
+            )
+            for product_id, product in snapshot.products.items()
+        }
+        self.product_list = _payload(
+            _json_array(payload.body for payload in self._products.values())
+        )
+        self._categories: Dict[int, JsonPayload] = {}
+
+    @classmethod
+    def for_snapshot(cls, snapshot: CatalogSnapshot) -> "CatalogPayloads":
+        """Get the payloads of a snapshot, built once per catalog version."""
+        return snapshot.derive('payloads', catalog_payloads.sync)
+
+    def product(self, product_id: int) -> Optional[JsonPayload]:
+        """Get the body of a single product, or None when it is not cached."""
+        return self._products.get(product_id)
+
+    def category(self, category_id: int) -> JsonPayload:
+        """Get the body listing the products of a category."""
+        if category_id not in self._categories:
+            self._categories[category_id] = _payload(_json_array(
+                self._products[product_id].body
+                for product_id in self._snapshot.by_category.get(category_id, [])
+            ))
+        return self._categories[category_id]
+
+class CatalogPayloadStore:
+    """Keeps the serialized payloads in step with the catalog snapshot."""
+
+    def __init__(self):
+        """Initialize without payloads."""
+        self.payloads: Optional[CatalogPayloads] = None
+
+    def sync(self, snapshot: CatalogSnapshot) -> CatalogPayloads:
+        """Get payloads for a snapshot, reusing the previous encodings."""
+        self.payloads = CatalogPayloads(snapshot, self.payloads)
+        return self.payloads
+
+# Create singleton instance
+catalog_payloads = CatalogPayloadStore()
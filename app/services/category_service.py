@@ -1,7 +1,90 @@
 """Category service with Supabase integration."""
-from typing import List, Optional
-from app.db.supabase import get_supabase
-from app.models.category import CategoryCreate, CategoryUpdate, Category
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from pydantic import TypeAdapter
+from app.core.config import get_settings
+from app.core.http_cache import make_etag
+from app.db.supabase import execute, get_supabase
+from app.models.category import CategoryCreate, CategoryStats, CategoryUpdate, Category, CategoryWithStats
+from app.services.catalog_payloads import JsonPayload
+from app.services.product_service import ProductService
+
+_LISTING_ADAPTER = TypeAdapter(List[CategoryWithStats])
+
+class CategoryListCache:
+    """In-process cache of the category listing with product aggregates.
+
+    The categories table is kept for ``CATALOG_TTL_SECONDS`` and dropped on
+    any category write made in this process. The merged listing and its
+    serialized body are rebuilt only when the categories or the catalog
+    aggregates they were built from change, which happens whenever the
+    product catalog gets a new version.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._categories: Optional[List[Category]] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._listing: Optional[List[CategoryWithStats]] = None
+        self._payload: Optional[JsonPayload] = None
+        self._listing_sources: tuple = (None, None)
+
+    async def get(
+        self,
+        loader: Callable[[], Awaitable[List[Category]]],
+        stats: Dict[int, CategoryStats]
+    ) -> List[CategoryWithStats]:
+        """Get the listing, reloading categories when expired."""
+        await self._refresh(loader, stats)
+        return self._listing
+
+    async def get_payload(
+        self,
+        loader: Callable[[], Awaitable[List[Category]]],
+        stats: Dict[int, CategoryStats]
+    ) -> JsonPayload:
+        """Get the serialized listing with its ETag, reloading categories when expired."""
+        await self._refresh(loader, stats)
+        return self._payload
+
+    async def _refresh(
+        self,
+        loader: Callable[[], Awaitable[List[Category]]],
+        stats: Dict[int, CategoryStats]
+    ) -> None:
+        """Reload expired categories and rebuild the listing when its sources changed."""
+        if self._categories is None or \
+                time.monotonic() - self._loaded_at >= get_settings().CATALOG_TTL_SECONDS:
+            generation = self._generation
+            categories = await loader()
+            # Keep the result only if no write invalidated it while loading
+            if generation == self._generation:
+                self._categories = categories
+                self._loaded_at = time.monotonic()
+        else:
+            categories = self._categories
+
+        sources_categories, sources_stats = self._listing_sources
+        if sources_categories is not categories or sources_stats is not stats:
+            self._listing = [
+                CategoryWithStats(
+                    **category.model_dump(),
+                    stats=stats.get(category.id, CategoryStats())
+                )
+                for category in categories
+            ]
+            body = _LISTING_ADAPTER.dump_json(self._listing)
+            self._payload = JsonPayload(body, make_etag([body]))
+            self._listing_sources = (categories, stats)
+
+    def invalidate(self) -> None:
+        """Force the next read to reload the categories."""
+        self._generation += 1
+        self._categories = None
+
+# Create singleton instance
+category_list_cache = CategoryListCache()
 
 class CategoryService:
     """Category service with Supabase integration."""
@@ -9,26 +92,39 @@ class CategoryService:
     def __init__(self):
         """Initialize service with Supabase client."""
         self.supabase = get_supabase()
+        self.product_service = ProductService()
 
     async def create_category(self, category: CategoryCreate) -> Category:
         """Create a new category."""
-        result = self.supabase.table('categories').insert({
-            'name': category.name,
-            'description': category.description
-        }).execute()
-        
+        result = await execute(
+            self.supabase.table('categories').insert({
+                'name': category.name,
+                'description': category.description
+            })
+        )
+        category_list_cache.invalidate()
         return Category(**result.data[0])
 
     async def get_category(self, category_id: int) -> Optional[Category]:
         """Get a category by ID."""
-        result = self.supabase.table('categories').select('*').eq('id', category_id).execute()
+        result = await execute(self.supabase.table('categories').select('*').eq('id', category_id))
         if not result.data:
             return None
         return Category(**result.data[0])
 
-    async def list_categories(self) -> List[Category]:
-        """Get all categories."""
-        result = self.supabase.table('categories').select('*').execute()
+    async def list_categories(self) -> List[CategoryWithStats]:
+        """Get all categories with their product aggregates."""
+        stats = await self.product_service.get_category_stats()
+        return await category_list_cache.get(self._load_categories, stats)
+
+    async def get_category_list_payload(self) -> JsonPayload:
+        """Get the serialized category listing with its ETag."""
+        stats = await self.product_service.get_category_stats()
+        return await category_list_cache.get_payload(self._load_categories, stats)
+
+    async def _load_categories(self) -> List[Category]:
+        """Load every category from Supabase."""
+        result = await execute(self.supabase.table('categories').select('*'))
         return [Category(**data) for data in result.data]
 
     async def update_category(self, category_id: int, category: CategoryUpdate) -> Optional[Category]:
@@ -37,15 +133,18 @@ class CategoryService:
         if not update_data:
             return await self.get_category(category_id)
 
-        result = self.supabase.table('categories').update(
-            update_data
-        ).eq('id', category_id).execute()
-        
+        result = await execute(
+            self.supabase.table('categories')
+            .update(update_data)
+            .eq('id', category_id)
+        )
+        category_list_cache.invalidate()
         if not result.data:
             return None
         return Category(**result.data[0])
 
     async def delete_category(self, category_id: int) -> bool:
         """Delete a category."""
-        result = self.supabase.table('categories').delete().eq('id', category_id).execute()
+        result = await execute(self.supabase.table('categories').delete().eq('id', category_id))
+        category_list_cache.invalidate()
         return bool(result.data) 
\ No newline at end of file
@@ -1,6 +1,6 @@
 """Chat service with Supabase integration."""
 from typing import List
-from app.db.supabase import get_supabase
+from app.db.supabase import execute, get_supabase
 from ecommerce_chatbot.chatbot import create_chatbot
 from langchain_core.messages import HumanMessage
 
@@ -31,7 +31,9 @@ class ChatService:
 
     async def get_product_info(self) -> List[dict]:
         """Get product information from Supabase."""
-        result = self.supabase.table('products').select(
-            'id', 'name', 'price', 'description', 'stock'
-        ).execute()
+        result = await execute(
+            self.supabase.table('products').select(
+                'id', 'name', 'price', 'description', 'stock'
+            )
+        )
         return result.data 
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""Item-to-item collaborative filtering from user interactions."""
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import get_settings
+from app.db.supabase import quote_filter_value
+from app.services.model_store import PublishedModel, publish_arrays
+
+# Interactions and product pairs are packed as (high << 32) | low codes
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+# Users with more distinct products than this stop adding co-occurrences
+MAX_ITEMS_PER_USER = 1000
+# Rows read per request when loading interactions
+INTERACTION_PAGE_SIZE = 1000
+# Keyset order of each interaction table, led by the time a row was written
+INTERACTION_KEYS = {
+    'user_views': ('viewed_at', 'user_id', 'product_id'),
+    'user_purchases': ('purchased_at', 'id'),
+}
+# Rows written this long before a watermark are read again, since a row can
+# commit after others with a later timestamp. Re-read pairs are ignored.
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+STATE_FILE = 'state.npz'
+NEIGHBOUR_ARRAYS = ('item_ids', 'indptr', 'neighbours', 'scores')
+
+def _after_key(columns: Sequence[str], values: Sequence[Any]) -> str:
+    """Build a PostgREST filter for the rows after a key in keyset order."""
+    clauses = []
+    for position, column in enumerate(columns):
+        terms = [f'{c}.eq.{quote_filter_value(v)}' for c, v in zip(columns[:position], values)]
+        terms.append(f'{column}.gt.{quote_filter_value(values[position])}')
+        clauses.append(f'and({",".join(terms)})' if len(terms) > 1 else terms[0])
+    return ','.join(clauses)
+
+def fetch_interactions(
+    client,
+    watermarks: Optional[Dict[str, str]] = None
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, str]]:
+    """Read the (user, product) pairs of user_views and user_purchases written since watermarks.
+
+    Each table is read in keyset order from ``WATERMARK_OVERLAP`` before
+    its watermark, or from the start without one. Returns the users, the
+    products and the new watermarks, the latest write time of each table.
+    """
+    watermarks = dict(watermarks or {})
+    users: List[int] = []
+    products: List[int] = []
+    for table, key in INTERACTION_KEYS.items():
+        query_start = None
+        if table in watermarks:
+            query_start = (datetime.fromisoformat(watermarks[table].replace('Z', '+00:00')) - WATERMARK_OVERLAP).isoformat()
+        last_key = None
+        while True:
+            query = client.table(table).select(', '.join(dict.fromkeys(key + ('user_id', 'product_id'))))
+            if query_start is not None:
+                query = query.gte(key[0], query_start)
+            if last_key is not None:
+                query = query.or_(_after_key(key, last_key))
+            for column in key:
+                query = query.order(column)
+            response = query.limit(INTERACTION_PAGE_SIZE).execute()
+            users.extend(row['user_id'] for row in response.data)
+            products.extend(row['product_id'] for row in response.data)
+            if response.data:
+                last_key = [response.data[-1][column] for column in key]
+                watermarks[table] = last_key[0]
+            if len(response.data) < INTERACTION_PAGE_SIZE:
+                break
+    return np.array(users, dtype=np.int64), np.array(products, dtype=np.int64), watermarks
+
+class ItemSimilarityBuilder:
+    """Sparse item co-occurrence counts, updated as interactions arrive.
+
+    The user x product matrix is binary and kept as sorted interaction
+    codes. Co-occurrences are sparse (product, product) pair codes with
+    counts. Adding interactions only counts pairs involving the new ones,
+    and ``watermarks`` record how far each interaction table has been read,
+    so a rebuild fetches and counts only the events written since the
+    previous one. The saved counts are still loaded and rewritten whole.
+    """
+
+    def __init__(self):
+        """Initialize without interactions."""
+        self.interactions = np.empty(0, dtype=np.int64)
+        self.pair_codes = np.empty(0, dtype=np.int64)
+        self.pair_counts = np.empty(0, dtype=np.int64)
+        self.watermarks: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, directory: Path) -> "ItemSimilarityBuilder":
+        """Load saved counts, or start empty when there are none."""
+        builder = cls()
+        path = Path(directory) / STATE_FILE
+        if path.exists():
+            with np.load(path) as state:
+                builder.interactions = state['interactions']
+                builder.pair_codes = state['pair_codes']
+                builder.pair_counts = state['pair_counts']
+                if 'watermarks' in state:
+                    builder.watermarks = json.loads(str(state['watermarks']))
+        return builder
+
+    def add_interactions(self, user_ids: np.ndarray, product_ids: np.ndarray) -> int:
+        """Count co-occurrences of the interactions not seen before.
+
+        Returns the number of new (user, product) pairs.
+        """
+        codes = np.unique((user_ids.astype(np.int64) << ID_BITS) | product_ids.astype(np.int64))
+        new = np.setdiff1d(codes, self.interactions, assume_unique=True)
+        if not len(new):
+            return 0
+
+        pairs = []
+        new_users = new >> ID_BITS
+        for group in np.split(new, np.flatnonzero(np.diff(new_users)) + 1):
+            user = group[0] >> ID_BITS
+            start, end = np.searchsorted(
+                self.interactions, [user << ID_BITS, (user + 1) << ID_BITS]
+            )
+            existing = self.interactions[start:end] & ID_MASK
+            added = (group & ID_MASK)[:max(MAX_ITEMS_PER_USER - len(existing), 0)]
+            if not len(added):
+                continue
+            # New items pair with every earlier item and with each other
+            pairs.append(_pair_codes(added, existing))
+            pairs.append(_pair_codes(existing, added))
+            among_added = _pair_codes(added, added)
+            pairs.append(among_added[(among_added >> ID_BITS) != (among_added & ID_MASK)])
+
+        self.interactions = np.union1d(self.interactions, new)
+        if pairs:
+            batch_codes, batch_counts = np.unique(np.concatenate(pairs), return_counts=True)
+            merged, inverse = np.unique(
+                np.concatenate([self.pair_codes, batch_codes]), return_inverse=True
+            )
+            self.pair_counts = np.bincount(
+                inverse,
+                weights=np.concatenate([self.pair_counts, batch_counts]),
+                minlength=len(merged)
+            ).astype(np.int64)
+            self.pair_codes = merged
+        return len(new)
+
+    def neighbours(self, top_n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Score pairs by cosine similarity and keep each product's top N.
+
+        Returns the products with neighbours, CSR row offsets into the
+        neighbour arrays, and the neighbour ids and scores, best first.
+        """
+        items, user_counts = np.unique(self.interactions & ID_MASK, return_counts=True)
+        first = self.pair_codes >> ID_BITS
+        second = self.pair_codes & ID_MASK
+        scores = self.pair_counts / np.sqrt(
+            user_counts[np.searchsorted(items, first)].astype(np.float64)
+            * user_counts[np.searchsorted(items, second)]
+        )
+
+        order = np.lexsort((second, -scores, first))
+        first, second, scores = first[order], second[order], scores[order]
+        rank = np.arange(len(first)) - np.searchsorted(first, first)
+        keep = rank < top_n
+        first, second, scores = first[keep], second[keep], scores[keep]
+
+        item_ids, starts = np.unique(first, return_index=True)
+        indptr = np.append(starts, len(first)).astype(np.int64)
+        return item_ids, indptr, second, scores.astype(np.float32)
+
+    def publish(self, directory: Path, top_n: int) -> Path:
+        """Save the counts and publish a new memory-mappable neighbour model."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            directory / f'{STATE_FILE}.tmp.npz',
+            interactions=self.interactions,
+            pair_codes=self.pair_codes,
+            pair_counts=self.pair_counts,
+            watermarks=np.array(json.dumps(self.watermarks))
+        )
+        os.replace(directory / f'{STATE_FILE}.tmp.npz', directory / STATE_FILE)
+
+        return publish_arrays(directory, dict(zip(NEIGHBOUR_ARRAYS, self.neighbours(top_n))))
+
+class ItemSimilarityIndex:
+    """Read side of the published neighbour model, memory-mapped."""
+
+    def __init__(self, directory: Optional[str] = None):
+        """Initialize without a loaded model."""
+        self._model = PublishedModel(
+            lambda: directory or get_settings().SIMILARITY_DIR, NEIGHBOUR_ARRAYS
+        )
+
+    def neighbours(self, product_id: int, limit: int) -> List[Tuple[int, float]]:
+        """Get the most similar products of a product with their scores."""
+        arrays = self._model.load()
+        if arrays is None:
+            return []
+        item_ids, indptr, neighbours, scores = arrays
+        position = np.searchsorted(item_ids, product_id)
+        if position == len(item_ids) or item_ids[position] != product_id:
+            return []
+        start = indptr[position]
+        end = min(indptr[position + 1], start + limit)
+        return list(zip(neighbours[start:end].tolist(), scores[start:end].tolist()))
+
+def _pair_codes(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Get the codes of every (first, second) product pair."""
+    return ((first[:, None] << ID_BITS) | second[None, :]).ravel()
+
+# Create singleton instance
+item_similarity_index = ItemSimilarityIndex()
@@ -0,0 +1,88 @@
+"""Versioned, memory-mappable NumPy model files."""
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import numpy as np
+
+CURRENT_FILE = 'CURRENT'
+# Seconds between checks for a newly published model
+RELOAD_INTERVAL = 5.0
+
+def new_version() -> str:
+    """Get a version name that sorts after every earlier one."""
+    return f'v{time.time_ns()}'
+
+def version_time(version: str) -> float:
+    """Get the wall-clock time a version name was created at."""
+    return int(version[1:]) / 1e9
+
+def current_version(directory: Path) -> Optional[str]:
+    """Get the name of the published model, if any."""
+    try:
+        return (Path(directory) / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+def publish_arrays(directory: Path, arrays: Dict[str, np.ndarray], version: Optional[str] = None) -> Path:
+    """Write a model as .npy files and make it the current one.
+
+    Each model goes to its own subdirectory and ``CURRENT`` is switched
+    atomically, so readers never see a partially written model. The
+    previous model is kept for readers that still have it mapped.
+    """
+    directory = Path(directory)
+    version = version or new_version()
+    model_dir = directory / version
+    model_dir.mkdir(parents=True)
+    for name, array in arrays.items():
+        np.save(model_dir / f'{name}.npy', array)
+
+    previous = current_version(directory)
+    pointer = directory / f'{CURRENT_FILE}.tmp'
+    pointer.write_text(version)
+    os.replace(pointer, directory / CURRENT_FILE)
+
+    for path in directory.iterdir():
+        if path.is_dir() and path.name not in (version, previous):
+            shutil.rmtree(path, ignore_errors=True)
+    return model_dir
+
+def load_arrays(directory: Path, version: str, names: Iterable[str]) -> Tuple[np.ndarray, ...]:
+    """Map the arrays of a model version without reading them into memory."""
+    model_dir = Path(directory) / version
+    return tuple(np.load(model_dir / f'{name}.npy', mmap_mode='r') for name in names)
+
+class PublishedModel:
+    """Read side of a published model, remapped when a new one appears.
+
+    ``CURRENT`` is checked at most once per ``RELOAD_INTERVAL``, so
+    callers can ask for the arrays on every request.
+    """
+
+    def __init__(self, directory: Callable[[], Path], names: Iterable[str]):
+        """Initialize without a mapped version."""
+        self._directory = directory
+        self.names = tuple(names)
+        self.version: Optional[str] = None
+        self.arrays: Optional[Tuple[np.ndarray, ...]] = None
+        self._checked_at = float('-inf')
+
+    @property
+    def directory(self) -> Path:
+        """Directory the model is published to."""
+        return Path(self._directory())
+
+    def load(self) -> Optional[Tuple[np.ndarray, ...]]:
+        """Get the arrays of the current model, mapping a newly published one."""
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_INTERVAL:
+            return self.arrays
+        self._checked_at = now
+
+        version = current_version(self.directory)
+        if version is not None and version != self.version:
+            self.arrays = load_arrays(self.directory, version, self.names)
+            self.version = version
+        return self.arrays
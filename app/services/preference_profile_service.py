@@ -0,0 +1,203 @@
+"""Incrementally maintained user preference profiles."""
+import math
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.core.config import get_settings
+from app.db.supabase import execute, get_supabase
+from app.models.product import Product
+from app.services.product_service import ProductService
+
+def decay_tau() -> float:
+    """Get the time constant of preference decay in seconds."""
+    return get_settings().PREFERENCE_HALF_LIFE_DAYS * 86400 / math.log(2)
+
+def coalesce_events(times: List[datetime]) -> Tuple[float, int, datetime]:
+    """Sum the weights of events decayed to the newest of them.
+
+    Returns the summed weight, the number of events and the newest time.
+    Every weight is exp(-age / tau) with a non-negative age, so it is at
+    most 1 and can never overflow.
+    """
+    at = max(times)
+    tau = decay_tau()
+    weight = sum(math.exp((t - at).total_seconds() / tau) for t in times)
+    return weight, len(times), at
+
+def preferences_from_profile(profile: Dict) -> Dict:
+    """Turn a stored profile into the preferences used for scoring."""
+    if not profile.get('event_count'):
+        return {}
+
+    category_weights = profile['category_weights']
+    label_weights = profile['label_weights']
+    preferences = {
+        # Set preferred categories (top 2)
+        'preferred_categories': [
+            int(category_id)
+            for category_id in sorted(category_weights, key=category_weights.get, reverse=True)[:2]
+        ],
+        # Set preferred labels (top 3)
+        'preferred_labels': sorted(label_weights, key=label_weights.get, reverse=True)[:3],
+        'price_range': (0, 0),
+        # Set preferred specs (most common value for each key)
+        'preferred_specs': {
+            spec_key: max(value_weights.items(), key=lambda x: x[1])[0]
+            for spec_key, value_weights in profile['spec_weights'].items()
+            if value_weights
+        }
+    }
+
+    # Set price range from the running weighted sums
+    if profile['price_weight'] > 0:
+        avg_price = profile['price_sum'] / profile['price_weight']
+        variance = max(profile['price_sq_sum'] / profile['price_weight'] - avg_price ** 2, 0.0)
+        std_price = math.sqrt(variance) if profile['event_count'] > 1 else avg_price * 0.2
+        preferences['price_range'] = (
+            max(0, avg_price - std_price),
+            avg_price + std_price
+        )
+
+    return preferences
+
+class PreferenceProfileService:
+    """Keeps per-user preference profiles up to date from tracked events."""
+
+    def __init__(self):
+        """Initialize service with dependencies."""
+        self.supabase = get_supabase()
+        self.product_service = ProductService()
+
+    async def get_profile(self, user_id: int) -> Optional[Dict]:
+        """Get a user's stored profile."""
+        result = await execute(
+            self.supabase.table('user_preference_profiles')
+            .select('*')
+            .eq('user_id', user_id)
+        )
+        return result.data[0] if result.data else None
+
+    async def record_event(self, user_id: int, product_id: int) -> None:
+        """Add a view or purchase of a product to the user's profile."""
+        await self.record_events({(user_id, product_id): [datetime.now(timezone.utc)]})
+
+    async def record_events(self, events: Dict[Tuple[int, int], List[datetime]]) -> None:
+        """Add coalesced events to their users' profiles in one call.
+
+        ``events`` maps (user id, product id) to the times of its events.
+        Events of unknown products are dropped.
+        """
+        products = await self.product_service.get_products_by_ids(
+            list({product_id for _, product_id in events})
+        )
+        rows = []
+        for (user_id, product_id), times in events.items():
+            product = products.get(product_id)
+            if product is None or not times:
+                continue
+            weight, count, at = coalesce_events(times)
+            rows.append({
+                'user_id': user_id,
+                'category_id': product.category_id or None,
+                'labels': product.labels or [],
+                'specs': product.specs or {},
+                'price': product.price,
+                'weight': weight,
+                'events': count,
+                'at': at.isoformat()
+            })
+        if rows:
+            await execute(self.supabase.rpc('record_preference_events', {
+                'p_events': rows,
+                'p_tau': decay_tau()
+            }))
+
+    async def build_from_history(self, user_id: int) -> Optional[Dict]:
+        """Rebuild a user's profile from their full history and store it.
+
+        Used the first time a profile that is not ``backfilled`` is read,
+        which covers users whose events predate profiles, including those
+        tracked since. The history tables hold every tracked event, so the
+        profile is replaced rather than added to. Every past event counts
+        with full weight as of now, matching the undecayed aggregation it
+        replaces. A backfilled profile is never overwritten.
+        """
+        # Get user's purchase history
+        purchase_history = await execute(
+            self.supabase.table('user_purchases')
+            .select('product_id')
+            .eq('user_id', user_id)
+        )
+
+        # Get user's viewed products
+        viewed_products = await execute(
+            self.supabase.table('user_views')
+            .select('product_id, view_count')
+            .eq('user_id', user_id)
+        )
+
+        # Count every purchase and view as weights and hydrate each product once
+        interaction_weights = Counter(p['product_id'] for p in purchase_history.data)
+        for view in viewed_products.data:
+            # One row holds every view of a product
+            interaction_weights[view['product_id']] += view.get('view_count') or 1
+        products = await self.product_service.get_products_by_ids(list(interaction_weights))
+        if not any(product_id in products for product_id in interaction_weights):
+            # Nothing to fold in, keep whatever tracking recorded
+            await execute(
+                self.supabase.table('user_preference_profiles')
+                .update({'backfilled': True})
+                .eq('user_id', user_id)
+            )
+            return None
+
+        profile = {
+            'user_id': user_id,
+            'category_weights': {},
+            'label_weights': {},
+            'spec_weights': {},
+            'price_weight': 0.0,
+            'price_sum': 0.0,
+            'price_sq_sum': 0.0,
+            'event_count': 0,
+            'decay_epoch': datetime.now(timezone.utc).isoformat(),
+            'backfilled': True
+        }
+        for product_id, count in interaction_weights.items():
+            if product_id in products:
+                _add_product(profile, products[product_id], count, count)
+
+        # Create the profile, or replace one tracking created before the backfill
+        await execute(
+            self.supabase.table('user_preference_profiles')
+            .upsert(profile, on_conflict='user_id', ignore_duplicates=True)
+        )
+        await execute(
+            self.supabase.table('user_preference_profiles')
+            .update({key: value for key, value in profile.items() if key != 'user_id'})
+            .eq('user_id', user_id)
+            .eq('backfilled', False)
+        )
+        return profile
+
+def _add_product(profile: Dict, product: Product, weight: float, events: int) -> None:
+    """Accumulate weighted interactions with a product into a profile."""
+    # Track categories
+    if product.category_id:
+        key = str(product.category_id)
+        profile['category_weights'][key] = profile['category_weights'].get(key, 0) + weight
+
+    # Track labels
+    for label in product.labels:
+        profile['label_weights'][label] = profile['label_weights'].get(label, 0) + weight
+
+    # Track prices
+    profile['price_weight'] += weight
+    profile['price_sum'] += weight * product.price
+    profile['price_sq_sum'] += weight * product.price ** 2
+    profile['event_count'] += events
+
+    # Track specs
+    for key, value in product.specs.items():
+        value_weights = profile['spec_weights'].setdefault(key, {})
+        value_weights[value] = value_weights.get(value, 0) + weight
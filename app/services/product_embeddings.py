@@ -0,0 +1,194 @@
+"""Content embeddings of products with an approximate nearest-neighbour index."""
+import math
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.core.config import get_settings
+from app.models.product import Product
+from app.services.model_store import PublishedModel, publish_arrays, version_time
+from app.services.product_search import product_terms
+
+# Lloyd iterations when clustering vectors into inverted lists
+KMEANS_ITERATIONS = 10
+# Inverted lists scanned per query
+DEFAULT_PROBES = 8
+
+MODEL_ARRAYS = ('ids', 'vectors', 'idf', 'centroids', 'list_indptr', 'list_rows')
+
+def _hashed_terms(product: Product, dimensions: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hash a product's weighted terms into buckets with signed log weights.
+
+    CRC32 is stable across processes, unlike ``hash``, so vectors built
+    offline and re-embedded in a worker agree.
+    """
+    buckets, weights = [], []
+    for term, frequency in product_terms(product).items():
+        code = zlib.crc32(term.encode())
+        buckets.append(code % dimensions)
+        sign = 1.0 if code & 0x80000000 else -1.0
+        weights.append(sign * (1.0 + math.log(frequency)))
+    return np.array(buckets, dtype=np.int64), np.array(weights, dtype=np.float32)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors to unit length, leaving zero vectors as they are."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+def embed_product(product: Product, idf: np.ndarray) -> np.ndarray:
+    """Embed one product with the bucket weights of a built model."""
+    buckets, weights = _hashed_terms(product, len(idf))
+    vector = np.zeros(len(idf), dtype=np.float32)
+    np.add.at(vector, buckets, weights * idf[buckets])
+    return _normalize(vector)
+
+def _kmeans(vectors: np.ndarray, clusters: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster unit vectors by cosine similarity (spherical k-means)."""
+    rng = np.random.default_rng(0)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        # Empty clusters keep their previous centroid
+        filled = np.bincount(assignments, minlength=clusters) > 0
+        centroids[filled] = _normalize(sums[filled])
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+def build_embedding_model(products: Iterable[Product], directory: Path, dimensions: int) -> Path:
+    """Embed a catalog, cluster it into inverted lists and publish the model.
+
+    Vectors are hashed TF-IDF: each term is hashed into one of
+    ``dimensions`` buckets with a random sign, weighted by
+    ``1 + log(tf)`` and by the bucket's inverse document frequency.
+    """
+    version_started = time.time_ns()
+    products = sorted(products, key=lambda p: p.id)
+    count = len(products)
+    hashed = [_hashed_terms(product, dimensions) for product in products]
+
+    document_frequency = np.zeros(dimensions, dtype=np.int64)
+    for buckets, _ in hashed:
+        document_frequency[np.unique(buckets)] += 1
+    idf = (np.log((1 + count) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    vectors = np.zeros((count, dimensions), dtype=np.float32)
+    rows = np.repeat(np.arange(count), [len(buckets) for buckets, _ in hashed])
+    if len(rows):
+        buckets = np.concatenate([buckets for buckets, _ in hashed])
+        weights = np.concatenate([weights for _, weights in hashed])
+        np.add.at(vectors, (rows, buckets), weights * idf[buckets])
+    vectors = _normalize(vectors)
+
+    clusters = max(1, min(count, int(math.sqrt(count))))
+    if count:
+        centroids, assignments = _kmeans(vectors, clusters)
+    else:
+        centroids, assignments = np.zeros((0, dimensions), dtype=np.float32), np.empty(0, dtype=np.int64)
+    list_rows = np.argsort(assignments, kind='stable')
+    list_indptr = np.searchsorted(assignments[list_rows], np.arange(len(centroids) + 1))
+
+    return publish_arrays(Path(directory), {
+        'ids': np.array([p.id for p in products], dtype=np.int64),
+        'vectors': vectors,
+        'idf': idf,
+        'centroids': centroids.astype(np.float32),
+        'list_indptr': list_indptr.astype(np.int64),
+        'list_rows': list_rows.astype(np.int64),
+    }, version=f'v{version_started}')
+
+class ProductEmbeddingIndex:
+    """Memory-mapped product vectors searched through inverted lists.
+
+    Queries score the centroids, then scan only the rows of the closest
+    lists. Products created or changed since the model was built are
+    re-embedded into an in-process overlay that takes precedence over the
+    mapped rows until a newer model includes them.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """Initialize without a loaded model."""
+        self._model = PublishedModel(
+            lambda: directory or get_settings().EMBEDDING_DIR, MODEL_ARRAYS
+        )
+        # Product id -> (vector or None when deleted, list, changed at)
+        self._overlay: Dict[int, Tuple[Optional[np.ndarray], int, float]] = {}
+
+    @property
+    def _arrays(self) -> Optional[Tuple[np.ndarray, ...]]:
+        """Arrays of the mapped model."""
+        return self._model.arrays
+
+    def load(self) -> bool:
+        """Map the current model, picking up newly published ones."""
+        mapped_version = self._model.version
+        if self._model.load() is None:
+            return False
+        if self._model.version != mapped_version:
+            # Changes made before this model's build started are part of it
+            built_at = version_time(self._model.version)
+            self._overlay = {
+                product_id: entry for product_id, entry in self._overlay.items()
+                if entry[2] >= built_at
+            }
+        return True
+
+    def reembed(self, product: Product) -> None:
+        """Refresh the vector of a created or changed product."""
+        if not self.load():
+            return
+        _, _, idf, centroids, _, _ = self._arrays
+        vector = embed_product(product, np.asarray(idf))
+        cluster = int(np.argmax(centroids @ vector)) if len(centroids) else 0
+        self._overlay[product.id] = (vector, cluster, time.time())
+
+    def remove(self, product_id: int) -> None:
+        """Stop returning a deleted product."""
+        self._overlay[product_id] = (None, -1, time.time())
+
+    def similar(self, product_id: int, limit: int, probes: int = DEFAULT_PROBES) -> List[Tuple[int, float]]:
+        """Get the products closest in content to a product with their scores."""
+        if not self.load():
+            return []
+        ids, vectors, _, centroids, list_indptr, list_rows = self._arrays
+        query = self._vector(product_id)
+        if query is None or not len(centroids):
+            return []
+
+        probed = np.argsort(-(centroids @ query))[:probes]
+        rows = np.concatenate([list_rows[list_indptr[c]:list_indptr[c + 1]] for c in probed])
+        candidate_ids = ids[rows]
+        scores = vectors[rows] @ query
+
+        # Overlay entries replace their mapped rows
+        keep = ~np.isin(candidate_ids, list(self._overlay)) & (candidate_ids != product_id)
+        candidate_ids, scores = candidate_ids[keep], scores[keep]
+        probed_lists = set(probed.tolist())
+        extra = [
+            (overlay_id, float(vector @ query))
+            for overlay_id, (vector, cluster, _) in self._overlay.items()
+            if vector is not None and cluster in probed_lists and overlay_id != product_id
+        ]
+        if extra:
+            candidate_ids = np.concatenate([candidate_ids, [i for i, _ in extra]])
+            scores = np.concatenate([scores, [s for _, s in extra]])
+
+        # Products with no positive similarity are not related at all
+        related = scores > 0
+        candidate_ids, scores = candidate_ids[related], scores[related]
+        best = np.argsort(-scores, kind='stable')[:limit]
+        return list(zip(candidate_ids[best].tolist(), scores[best].tolist()))
+
+    def _vector(self, product_id: int) -> Optional[np.ndarray]:
+        """Get the current vector of a product."""
+        if product_id in self._overlay:
+            return self._overlay[product_id][0]
+        ids, vectors = self._arrays[0], self._arrays[1]
+        position = np.searchsorted(ids, product_id)
+        if position == len(ids) or ids[position] != product_id:
+            return None
+        return np.asarray(vectors[position])
+
+# Create singleton instance
+product_embedding_index = ProductEmbeddingIndex()
@@ -0,0 +1,133 @@
+"""In-memory faceted filtering index over the product catalog."""
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from app.models.product import Product, ProductFacets
+from app.services.catalog_cache import CatalogSnapshot
+
+class ProductFacetIndex:
+    """Bitmap index over a catalog snapshot.
+
+    Products are assigned bit positions in ascending price order, so every
+    label, category and the in-stock flag is a Python int bitmap, and any
+    price range is a contiguous run of bits found by bisecting the sorted
+    prices. Filters combine with plain integer AND/OR.
+    """
+
+    def __init__(self, products: Iterable[Product]):
+        """Build the bitmaps for a set of products."""
+        ordered = sorted(products, key=lambda p: (p.price, p.id))
+        self.products: List[Product] = ordered
+        self.prices: List[float] = [p.price for p in ordered]
+        self.all_bits = (1 << len(ordered)) - 1
+
+        # Collect positions first, then pack each bitmap in a single pass
+        in_stock_positions = []
+        label_positions: Dict[str, List[int]] = {}
+        category_positions: Dict[int, List[int]] = {}
+        for position, product in enumerate(ordered):
+            if product.stock > 0:
+                in_stock_positions.append(position)
+            category_positions.setdefault(product.category_id, []).append(position)
+            for label in set(product.labels or []):
+                label_positions.setdefault(label, []).append(position)
+
+        size = len(ordered)
+        self.in_stock_bits = _bits_from_positions(in_stock_positions, size)
+        self.label_bits: Dict[str, int] = {
+            label: _bits_from_positions(positions, size)
+            for label, positions in label_positions.items()
+        }
+        self.category_bits: Dict[int, int] = {
+            category_id: _bits_from_positions(positions, size)
+            for category_id, positions in category_positions.items()
+        }
+
+    @classmethod
+    def for_snapshot(cls, snapshot: CatalogSnapshot) -> "ProductFacetIndex":
+        """Get the index of a snapshot, built once per catalog version."""
+        return snapshot.derive('facet_index', lambda s: cls(s.products.values()))
+
+    def match(
+        self,
+        labels: Optional[List[str]] = None,
+        match_all_labels: bool = True,
+        category_ids: Optional[List[int]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock_only: bool = False
+    ) -> int:
+        """Get the bitmap of products matching every given filter."""
+        bits = self.all_bits
+        if labels:
+            label_sets = [self.label_bits.get(label, 0) for label in labels]
+            if match_all_labels:
+                for label_set in label_sets:
+                    bits &= label_set
+            else:
+                any_label = 0
+                for label_set in label_sets:
+                    any_label |= label_set
+                bits &= any_label
+        if category_ids:
+            any_category = 0
+            for category_id in category_ids:
+                any_category |= self.category_bits.get(category_id, 0)
+            bits &= any_category
+        if min_price is not None or max_price is not None:
+            bits &= self._price_range_bits(min_price, max_price)
+        if in_stock_only:
+            bits &= self.in_stock_bits
+        return bits
+
+    def products_for(self, bits: int) -> List[Product]:
+        """Get the products in a bitmap, ordered by id."""
+        matched = [self.products[position] for position in self._positions(bits)]
+        return sorted(matched, key=lambda p: p.id)
+
+    def facets(self, bits: int) -> ProductFacets:
+        """Count labels, categories and stock within a bitmap."""
+        label_counts = {
+            label: count
+            for label, label_set in self.label_bits.items()
+            if (count := _popcount(bits & label_set))
+        }
+        category_counts = {
+            category_id: count
+            for category_id, category_set in self.category_bits.items()
+            if (count := _popcount(bits & category_set))
+        }
+        positions = self._positions(bits)
+        return ProductFacets(
+            labels=label_counts,
+            categories=category_counts,
+            in_stock=_popcount(bits & self.in_stock_bits),
+            # Positions are in price order, so the ends hold the price bounds
+            min_price=self.prices[positions[0]] if len(positions) else None,
+            max_price=self.prices[positions[-1]] if len(positions) else None
+        )
+
+    def _price_range_bits(self, min_price: Optional[float], max_price: Optional[float]) -> int:
+        """Get the contiguous bitmap of products priced within a range."""
+        start = bisect_left(self.prices, min_price) if min_price is not None else 0
+        end = bisect_right(self.prices, max_price) if max_price is not None else len(self.prices)
+        if end <= start:
+            return 0
+        return ((1 << end) - 1) ^ ((1 << start) - 1)
+
+    def _positions(self, bits: int) -> np.ndarray:
+        """Get the set bit positions of a bitmap in ascending order."""
+        if not bits:
+            return np.empty(0, dtype=np.int64)
+        raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, bitorder='little'))
+
+def _bits_from_positions(positions: List[int], size: int) -> int:
+    """Pack bit positions into a bitmap."""
+    mask = np.zeros(size, dtype=bool)
+    mask[positions] = True
+    return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+def _popcount(bits: int) -> int:
+    """Count the set bits of a bitmap."""
+    return bin(bits).count('1')
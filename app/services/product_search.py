@@ -0,0 +1,149 @@
+"""Full-text product search with an in-process BM25 inverted index."""
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from app.models.product import Product
+from app.services.catalog_cache import CatalogSnapshot
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Term frequency weight of each product field
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'labels': 2.0,
+    'specs': 1.0,
+    'description': 1.0,
+}
+
+STOPWORDS = frozenset("""
+a al algo ante con contra cual de del desde donde el ella ellas ellos en entre
+era es esta este esto estos hasta la las le les lo los mas mi muy no o para pero
+por que se sin sobre su sus te tu un una uno unos y ya and for in of on or the to
+with
+""".split())
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def fold_accents(text: str) -> str:
+    """Lowercase text and strip diacritics, so "cámara" matches "camara"."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+def stem(token: str) -> str:
+    """Apply light Spanish stemming, mostly folding gender and plural endings."""
+    if len(token) < 5 or token.isdigit():
+        return token
+    if token[-1] in 'oae':
+        return token[:-1]
+    if token[-1] == 's':
+        if token.endswith('eses'):
+            return token[:-2]
+        if token.endswith('ces'):
+            return token[:-3] + 'z'
+        if token[-2] in 'oae':
+            return token[:-2]
+    return token
+
+def analyze(text: Optional[str]) -> List[str]:
+    """Split text into folded, stemmed terms without stopwords."""
+    if not text:
+        return []
+    return [
+        stem(token)
+        for token in TOKEN_PATTERN.findall(fold_accents(text))
+        if token not in STOPWORDS
+    ]
+
+def product_terms(product: Product) -> Dict[str, float]:
+    """Get the weighted term frequencies of a product's searchable fields."""
+    fields = {
+        'name': product.name,
+        'description': product.description,
+        'labels': ' '.join(product.labels or []),
+        'specs': ' '.join(str(v) for v in (product.specs or {}).values()),
+    }
+    terms: Dict[str, float] = Counter()
+    for field, text in fields.items():
+        for term in analyze(text):
+            terms[term] += FIELD_WEIGHTS[field]
+    return terms
+
+class ProductSearchIndex:
+    """Inverted index over product text, scored with BM25.
+
+    The index follows the catalog snapshot incrementally: ``sync`` only
+    re-indexes products whose objects changed since the last synced version
+    and drops products that disappeared.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.doc_lengths: Dict[int, float] = {}
+        self.total_length = 0.0
+        self.products: Dict[int, Product] = {}
+        self.version: Optional[int] = None
+
+    def sync(self, snapshot: CatalogSnapshot) -> None:
+        """Bring the index up to date with a catalog snapshot."""
+        if self.version == snapshot.version:
+            return
+        for product_id, product in snapshot.products.items():
+            if self.products.get(product_id) is not product:
+                self.add(product)
+        for product_id in [i for i in self.products if i not in snapshot.products]:
+            self.remove(product_id)
+        self.version = snapshot.version
+
+    def add(self, product: Product) -> None:
+        """Index a product, replacing any previous version of it."""
+        self.remove(product.id)
+        terms = product_terms(product)
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[product.id] = frequency
+        length = sum(terms.values())
+        self.doc_lengths[product.id] = length
+        self.total_length += length
+        self.products[product.id] = product
+
+    def remove(self, product_id: int) -> None:
+        """Remove a product from the index."""
+        product = self.products.pop(product_id, None)
+        if product is None:
+            return
+        for term in product_terms(product):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(product_id, 0.0)
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[Product, float]]:
+        """Get the best matching products for a query with their scores."""
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return []
+        average_length = self.total_length / doc_count or 1.0
+
+        scores: Dict[int, float] = {}
+        for term in set(analyze(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for product_id, frequency in postings.items():
+                norm = K1 * (1 - B + B * self.doc_lengths[product_id] / average_length)
+                scores[product_id] = scores.get(product_id, 0.0) + \
+                    idf * frequency * (K1 + 1) / (frequency + norm)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.products[product_id], score) for product_id, score in best]
+
+# Create singleton instance
+product_search_index = ProductSearchIndex()
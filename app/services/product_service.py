@@ -1,7 +1,63 @@
 """Product service with Supabase integration."""
-from typing import Dict, List, Optional
-from app.db.supabase import get_supabase
-from app.models.product import ProductCreate, ProductUpdate, Product
+import base64
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from postgrest.exceptions import APIError
+from app.db.supabase import execute, get_supabase, quote_filter_value
+from app.models.category import CategoryStats
+from app.models.product import (
+    FacetedProductsResponse,
+    Product,
+    ProductBulkItemResult,
+    ProductCreate,
+    ProductSearchHit,
+    ProductUpdate
+)
+from app.services.catalog_cache import catalog_cache
+from app.services.catalog_columns import CatalogColumns
+from app.services.catalog_payloads import CatalogPayloads
+from app.services.product_embeddings import product_embedding_index
+from app.services.product_index import ProductFacetIndex
+from app.services.product_search import product_search_index
+
+logger = logging.getLogger(__name__)
+
+# Columns stored on the products table
+PRODUCT_COLUMNS = (
+    'id', 'name', 'description', 'price', 'stock',
+    'category_id', 'image_url', 'created_at', 'updated_at'
+)
+# Fields that can be requested from a product page
+PAGE_FIELDS = PRODUCT_COLUMNS + ('specs', 'labels')
+# Columns a product page can be sorted by, always tie-broken by id
+SORT_FIELDS = ('id', 'price', 'name', 'stock')
+# Maximum rows sent in a single multi-row write
+BULK_CHUNK_SIZE = 500
+# Products fetched per request when loading the whole catalog
+CATALOG_PAGE_SIZE = 1000
+
+# Embedded selects hydrating a product's specs and label names
+SPECS_EMBED = 'product_specs(spec_key, spec_value)'
+LABELS_EMBED = 'product_labels(labels(name))'
+PRODUCT_SELECT = f'*, {SPECS_EMBED}, {LABELS_EMBED}'
+EMBEDDED_RELATIONS = ('product_specs', 'product_labels')
+
+def _encode_cursor(sort: str, value: Any, product_id: int) -> str:
+    """Encode the keyset position after a row as an opaque cursor."""
+    raw = json.dumps([sort, value, product_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """Decode a cursor into the sort value and id of the last row seen."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, product_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or not isinstance(product_id, int):
+        raise ValueError("Cursor does not match the requested sort")
+    return value, product_id
 
 class ProductService:
     """Product service with Supabase integration."""
@@ -13,14 +69,7 @@ class ProductService:
     async def create_product(self, product: ProductCreate) -> Product:
         """Create a new product."""
         # Insert product base data
-        result = self.supabase.table('products').insert({
-            'name': product.name,
-            'price': product.price,
-            'description': product.description,
-            'stock': product.stock,
-            'category_id': product.category_id,
-            'image_url': product.image_url
-        }).execute()
+        result = await execute(self.supabase.table('products').insert(self._product_row(product)))
         
         product_id = result.data[0]['id']
 
@@ -30,122 +79,352 @@ class ProductService:
                 {'product_id': product_id, 'spec_key': k, 'spec_value': v}
                 for k, v in product.specs.items()
             ]
-            self.supabase.table('product_specs').insert(specs_data).execute()
+            await execute(self.supabase.table('product_specs').insert(specs_data))
 
         # Insert labels
         if product.labels:
-            # First, ensure all labels exist
-            for label in product.labels:
-                self.supabase.table('labels').upsert(
-                    {'name': label}, on_conflict='name'
-                ).execute()
-
-            # Get label IDs
-            label_results = self.supabase.table('labels').select('id').in_('name', product.labels).execute()
-            label_ids = [row['id'] for row in label_results.data]
+            label_ids = await self._resolve_label_ids(product.labels)
 
             # Create product-label relationships
             label_relations = [
                 {'product_id': product_id, 'label_id': label_id}
-                for label_id in label_ids
+                for label_id in label_ids.values()
             ]
-            self.supabase.table('product_labels').insert(label_relations).execute()
-
-        return await self.get_product(product_id)
-
-    def _process_product_data(self, product_data: dict, specs_map: Dict[str, Dict[str, str]], labels_map: Dict[str, List[str]]) -> Product:
-        """Process product data with its specs and labels."""
-        product_id = product_data['id']
-        return Product(
-            **product_data,
-            specs=specs_map.get(product_id, {}),
-            labels=labels_map.get(product_id, [])
+            await execute(self.supabase.table('product_labels').insert(label_relations))
+
+        created_product = await self.get_product(product_id)
+        if created_product:
+            catalog_cache.put(created_product)
+            product_embedding_index.reembed(created_product)
+        return created_product
+
+    async def create_products_bulk(self, products: List[ProductCreate]) -> List[ProductBulkItemResult]:
+        """Create many products with chunked multi-row inserts.
+
+        Labels for the whole batch are resolved up front, then each chunk of
+        products is inserted together with its specs and label links. A chunk
+        that fails is removed again so it never leaves partial products, and
+        is retried in halves until only the items failing on their own are
+        reported as failed. Created products are re-embedded like single
+        creations, so they show up in similar-product results at once.
+        """
+        results = [ProductBulkItemResult(index=i, success=False) for i in range(len(products))]
+        label_ids = await self._resolve_label_ids(
+            [label for product in products for label in product.labels]
         )
 
+        indexed = list(enumerate(products))
+        for start in range(0, len(indexed), BULK_CHUNK_SIZE):
+            await self._create_chunk(indexed[start:start + BULK_CHUNK_SIZE], label_ids, results)
+
+        if any(result.success for result in results):
+            catalog_cache.invalidate()
+        return results
+
+    async def _create_chunk(
+        self,
+        chunk: List[Tuple[int, ProductCreate]],
+        label_ids: Dict[str, int],
+        results: List[ProductBulkItemResult]
+    ) -> None:
+        """Insert a chunk of indexed products, splitting it when it fails."""
+        try:
+            product_result = await execute(
+                self.supabase.table('products')
+                .insert([self._product_row(product) for _, product in chunk])
+            )
+        except APIError as e:
+            await self._split_chunk(chunk, label_ids, results, e)
+            return
+
+        rows = product_result.data
+        specs_data = [
+            {'product_id': row['id'], 'spec_key': k, 'spec_value': v}
+            for row, (_, product) in zip(rows, chunk)
+            for k, v in product.specs.items()
+        ]
+        label_relations = [
+            {'product_id': row['id'], 'label_id': label_ids[label]}
+            for row, (_, product) in zip(rows, chunk)
+            for label in dict.fromkeys(product.labels)
+        ]
+        try:
+            await self._insert_chunked('product_specs', specs_data)
+            await self._insert_chunked('product_labels', label_relations)
+        except APIError as e:
+            product_ids = [row['id'] for row in rows]
+            try:
+                # Roll the chunk back, specs and links cascade with it
+                await execute(
+                    self.supabase.table('products')
+                    .delete()
+                    .in_('id', product_ids)
+                )
+            except APIError:
+                # Retrying would duplicate products that are still there
+                logger.exception("Could not roll back bulk products %s", product_ids)
+                for (index, _), product_id in zip(chunk, product_ids):
+                    results[index].id = product_id
+                    results[index].error = f"{e.message} (rollback failed, product is incomplete)"
+                return
+            await self._split_chunk(chunk, label_ids, results, e)
+            return
+
+        for (index, product), row in zip(chunk, rows):
+            results[index].id = row['id']
+            results[index].success = True
+            # The inserted row and its request make up the whole product
+            product_embedding_index.reembed(Product(
+                **row,
+                specs=product.specs,
+                labels=list(dict.fromkeys(product.labels))
+            ))
+
+    async def _split_chunk(
+        self,
+        chunk: List[Tuple[int, ProductCreate]],
+        label_ids: Dict[str, int],
+        results: List[ProductBulkItemResult],
+        error: APIError
+    ) -> None:
+        """Retry a failed chunk in halves, or fail its only item."""
+        if len(chunk) == 1:
+            results[chunk[0][0]].error = error.message
+            return
+        middle = len(chunk) // 2
+        await self._create_chunk(chunk[:middle], label_ids, results)
+        await self._create_chunk(chunk[middle:], label_ids, results)
+
+    def _product_row(self, product: ProductCreate) -> dict:
+        """Build the products table row for a new product."""
+        return {
+            'name': product.name,
+            'price': product.price,
+            'description': product.description,
+            'stock': product.stock,
+            'category_id': product.category_id,
+            'image_url': product.image_url
+        }
+
+    async def _insert_chunked(self, table: str, rows: List[dict]) -> None:
+        """Insert rows with multi-row statements of at most BULK_CHUNK_SIZE rows."""
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            await execute(self.supabase.table(table).insert(rows[start:start + BULK_CHUNK_SIZE]))
+
+    async def _resolve_label_ids(self, names: List[str]) -> Dict[str, int]:
+        """Ensure labels exist and map each distinct name to its id.
+
+        Uses one upsert and one select per BULK_CHUNK_SIZE distinct names,
+        whatever the number of products sharing them.
+        """
+        distinct_names = list(dict.fromkeys(names))
+        label_ids = {}
+        for start in range(0, len(distinct_names), BULK_CHUNK_SIZE):
+            chunk = distinct_names[start:start + BULK_CHUNK_SIZE]
+            await execute(
+                self.supabase.table('labels').upsert(
+                    [{'name': name} for name in chunk],
+                    on_conflict='name',
+                    ignore_duplicates=True
+                )
+            )
+            label_results = await execute(
+                self.supabase.table('labels')
+                .select('id, name')
+                .in_('name', chunk)
+            )
+            label_ids.update({row['name']: row['id'] for row in label_results.data})
+        return label_ids
+
+    def _hydrate_product(self, row: dict) -> Product:
+        """Build a product from a row selected with PRODUCT_SELECT."""
+        return Product(**self._flatten_relations(row))
+
+    def _flatten_relations(self, row: dict) -> dict:
+        """Turn embedded spec and label rows into specs and labels fields."""
+        data = {k: v for k, v in row.items() if k not in EMBEDDED_RELATIONS}
+        if 'product_specs' in row:
+            data['specs'] = {
+                spec['spec_key']: spec['spec_value']
+                for spec in row['product_specs'] or []
+            }
+        if 'product_labels' in row:
+            data['labels'] = [
+                link['labels']['name']
+                for link in row['product_labels'] or []
+                if link.get('labels')
+            ]
+        return data
+
     async def get_product(self, product_id: int) -> Optional[Product]:
-        """Get a product by ID."""
-        # Get product with specs and labels in a single query
-        result = self.supabase.table('products')\
-            .select(
-                '*',
-                count='exact'
-            )\
-            .eq('id', product_id)\
-            .execute()
+        """Get a product by ID with its specs and labels in a single query."""
+        result = await execute(
+            self.supabase.table('products')
+            .select(PRODUCT_SELECT)
+            .eq('id', product_id)
+        )
         
         if not result.data:
             return None
+        return self._hydrate_product(result.data[0])
+
+    async def get_products_by_ids(self, product_ids: List[int]) -> Dict[int, Product]:
+        """Get several products by ID, skipping ids that do not exist.
+
+        Products are served from the catalog snapshot; any id missing from it
+        is read with one embedded select per BULK_CHUNK_SIZE ids.
+        """
+        snapshot = await catalog_cache.get(self.load_catalog)
+        products = {}
+        missing = []
+        for product_id in dict.fromkeys(product_ids):
+            product = snapshot.get(product_id)
+            if product is not None:
+                products[product_id] = product
+            else:
+                missing.append(product_id)
+
+        for start in range(0, len(missing), BULK_CHUNK_SIZE):
+            result = await execute(
+                self.supabase.table('products')
+                .select(PRODUCT_SELECT)
+                .in_('id', missing[start:start + BULK_CHUNK_SIZE])
+            )
+            for row in result.data:
+                product = self._hydrate_product(row)
+                products[product.id] = product
+        return products
 
-        product_data = result.data[0]
-
-        # Get specs in a single query
-        specs_result = self.supabase.table('product_specs')\
-            .select('*')\
-            .eq('product_id', product_id)\
-            .execute()
-        specs = {row['spec_key']: row['spec_value'] for row in specs_result.data}
+    async def list_products(self) -> List[Product]:
+        """Get all products from the cached catalog snapshot."""
+        snapshot = await catalog_cache.get(self.load_catalog)
+        return snapshot.list()
+
+    async def get_catalog_payloads(self) -> CatalogPayloads:
+        """Get the pre-serialized JSON bodies of the current catalog snapshot."""
+        snapshot = await catalog_cache.get(self.load_catalog)
+        return CatalogPayloads.for_snapshot(snapshot)
+
+    async def get_catalog_columns(self) -> CatalogColumns:
+        """Get the columnar NumPy view of the current catalog snapshot."""
+        snapshot = await catalog_cache.get(self.load_catalog)
+        return CatalogColumns.for_snapshot(snapshot)
+
+    async def get_category_stats(self) -> Dict[int, CategoryStats]:
+        """Get product aggregates per category, computed once per catalog version."""
+        snapshot = await catalog_cache.get(self.load_catalog)
+        return snapshot.derive(
+            'category_stats',
+            lambda s: CatalogColumns.for_snapshot(s).category_stats()
+        )
 
-        # Get labels in a single query
-        labels_result = self.supabase.table('product_labels')\
-            .select('labels(name)')\
-            .eq('product_id', product_id)\
-            .execute()
-        
-        labels = [
-            row['labels']['name'] 
-            for row in labels_result.data 
-            if row.get('labels')
+    async def load_catalog(self) -> List[Product]:
+        """Load the full catalog from Supabase, bypassing the snapshot."""
+        products = []
+        async for chunk in self.iter_product_chunks():
+            products.extend(chunk)
+        return products
+
+    async def iter_product_chunks(
+        self,
+        chunk_size: int = CATALOG_PAGE_SIZE
+    ) -> AsyncIterator[List[Product]]:
+        """Stream the catalog from Supabase in keyset pages of hydrated products.
+
+        Only one page is held at a time, so memory stays constant whatever
+        the catalog size.
+        """
+        last_id = 0
+        while True:
+            result = await execute(
+                self.supabase.table('products')
+                .select(PRODUCT_SELECT)
+                .gt('id', last_id)
+                .order('id')
+                .limit(chunk_size)
+            )
+            rows = result.data or []
+            if rows:
+                yield [self._hydrate_product(row) for row in rows]
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1]['id']
+
+    async def list_products_page(
+        self,
+        limit: int,
+        after: Optional[str] = None,
+        sort: str = 'id',
+        fields: Optional[List[str]] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Get one keyset page of products, optionally projected to some fields.
+
+        Returns the page items and the cursor for the next page, or None when
+        this is the last page. Raises ValueError for an unknown sort, field or
+        a cursor that does not belong to the requested sort.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Unsupported sort field: {sort}")
+        requested = set(fields) if fields else set(PAGE_FIELDS)
+        unknown = requested - set(PAGE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unsupported fields: {', '.join(sorted(unknown))}")
+        requested.add('id')
+
+        # Only select the columns needed for the projection and the cursor,
+        # embedding specs and labels for this page's products when requested
+        columns = [c for c in PRODUCT_COLUMNS if c in requested or c == sort]
+        if 'specs' in requested:
+            columns.append(SPECS_EMBED)
+        if 'labels' in requested:
+            columns.append(LABELS_EMBED)
+        query = self.supabase.table('products').select(','.join(columns))
+        if after:
+            last_value, last_id = _decode_cursor(after, sort)
+            if sort == 'id':
+                query = query.gt('id', last_id)
+            else:
+                value = quote_filter_value(last_value)
+                query = query.or_(
+                    f'{sort}.gt.{value},and({sort}.eq.{value},id.gt.{last_id})'
+                )
+        result = await execute(query.order(sort).order('id').limit(limit))
+        rows = result.data or []
+
+        items = [
+            {k: v for k, v in self._flatten_relations(row).items() if k in requested}
+            for row in rows
         ]
 
-        return Product(
-            **product_data,
-            specs=specs,
-            labels=labels
-        )
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = _encode_cursor(sort, rows[-1][sort], rows[-1]['id'])
+        return items, next_cursor
 
-    async def list_products(self) -> List[Product]:
-        """Get all products with optimized queries."""
-        # Get all products
-        products_result = self.supabase.table('products').select('*').execute()
-        if not products_result.data:
-            return []
+    async def _get_relations(self, product_id: int) -> Tuple[Dict[str, str], Dict[str, int]]:
+        """Get a product's current specs and label links in a single query.
 
-        product_ids = [p['id'] for p in products_result.data]
-        
-        # Get all specs in a single query
-        specs_result = self.supabase.table('product_specs')\
-            .select('*')\
-            .in_('product_id', product_ids)\
-            .execute()
-        
-        # Create specs map
-        specs_map = {}
-        for spec in specs_result.data:
-            product_id = spec['product_id']
-            if product_id not in specs_map:
-                specs_map[product_id] = {}
-            specs_map[product_id][spec['spec_key']] = spec['spec_value']
-
-        # Get all labels in a single query
-        labels_result = self.supabase.table('product_labels')\
-            .select('product_id, labels(name)')\
-            .in_('product_id', product_ids)\
-            .execute()
-        
-        # Create labels map
-        labels_map = {}
-        for label_rel in labels_result.data:
-            product_id = label_rel['product_id']
-            if label_rel.get('labels') and label_rel['labels'].get('name'):
-                if product_id not in labels_map:
-                    labels_map[product_id] = []
-                labels_map[product_id].append(label_rel['labels']['name'])
-
-        # Combine all data
-        return [
-            self._process_product_data(product_data, specs_map, labels_map)
-            for product_data in products_result.data
-        ]
+        Returns the specs and a map of linked label names to their ids.
+        """
+        result = await execute(
+            self.supabase.table('products')
+            .select('product_specs(spec_key, spec_value), product_labels(label_id, labels(name))')
+            .eq('id', product_id)
+        )
+        if not result.data:
+            return {}, {}
+
+        row = result.data[0]
+        specs = {
+            spec['spec_key']: spec['spec_value']
+            for spec in row.get('product_specs') or []
+        }
+        label_links = {
+            link['labels']['name']: link['label_id']
+            for link in row.get('product_labels') or []
+            if link.get('labels')
+        }
+        return specs, label_links
 
     async def update_product(self, product_id: int, product: ProductUpdate) -> Optional[Product]:
         """Update a product."""
@@ -155,140 +434,125 @@ class ProductService:
         base_fields = {'name', 'price', 'description', 'stock', 'category_id'}
         base_update = {k: v for k, v in update_data.items() if k in base_fields}
         if base_update:
-            self.supabase.table('products').update(base_update).eq('id', product_id).execute()
+            await execute(self.supabase.table('products').update(base_update).eq('id', product_id))
 
-        # Update specs if provided
-        if 'specs' in update_data:
-            # Delete existing specs
-            self.supabase.table('product_specs').delete().eq('product_id', product_id).execute()
-            # Insert new specs
-            if update_data['specs']:
-                specs_data = [
-                    {'product_id': product_id, 'spec_key': k, 'spec_value': v}
-                    for k, v in update_data['specs'].items()
-                ]
-                self.supabase.table('product_specs').insert(specs_data).execute()
+        # Read the current specs and labels to diff against
+        if 'specs' in update_data or 'labels' in update_data:
+            current_specs, current_links = await self._get_relations(product_id)
 
-        # Update labels if provided
+        # Update specs if provided, only writing the keys that changed
+        if 'specs' in update_data:
+            new_specs = update_data['specs'] or {}
+            removed_keys = [k for k in current_specs if k not in new_specs]
+            changed_specs = [
+                {'product_id': product_id, 'spec_key': k, 'spec_value': v}
+                for k, v in new_specs.items()
+                if current_specs.get(k) != v
+            ]
+            if removed_keys:
+                await execute(
+                    self.supabase.table('product_specs')
+                    .delete()
+                    .eq('product_id', product_id)
+                    .in_('spec_key', removed_keys)
+                )
+            if changed_specs:
+                await execute(
+                    self.supabase.table('product_specs')
+                    .upsert(changed_specs, on_conflict='product_id,spec_key')
+                )
+
+        # Update labels if provided, only linking and unlinking the differences
         if 'labels' in update_data:
-            # Delete existing label relationships
-            self.supabase.table('product_labels').delete().eq('product_id', product_id).execute()
-            # Insert new labels
-            if update_data['labels']:
-                # Ensure labels exist
-                for label in update_data['labels']:
-                    self.supabase.table('labels').upsert(
-                        {'name': label}, on_conflict='name'
-                    ).execute()
-
-                # Get label IDs and create relationships
-                label_results = self.supabase.table('labels').select('id').in_('name', update_data['labels']).execute()
-                label_ids = [row['id'] for row in label_results.data]
+            new_labels = list(dict.fromkeys(update_data['labels'] or []))
+            removed_ids = [
+                label_id for name, label_id in current_links.items()
+                if name not in new_labels
+            ]
+            added_labels = [name for name in new_labels if name not in current_links]
+            if removed_ids:
+                await execute(
+                    self.supabase.table('product_labels')
+                    .delete()
+                    .eq('product_id', product_id)
+                    .in_('label_id', removed_ids)
+                )
+            if added_labels:
+                label_ids = await self._resolve_label_ids(added_labels)
                 label_relations = [
                     {'product_id': product_id, 'label_id': label_id}
-                    for label_id in label_ids
+                    for label_id in label_ids.values()
                 ]
-                self.supabase.table('product_labels').insert(label_relations).execute()
+                await execute(self.supabase.table('product_labels').insert(label_relations))
 
-        return await self.get_product(product_id)
+        updated_product = await self.get_product(product_id)
+        if updated_product:
+            catalog_cache.put(updated_product)
+            product_embedding_index.reembed(updated_product)
+        return updated_product
 
     async def delete_product(self, product_id: int) -> bool:
         """Delete a product."""
-        result = self.supabase.table('products').delete().eq('id', product_id).execute()
+        result = await execute(self.supabase.table('products').delete().eq('id', product_id))
+        catalog_cache.remove(product_id)
+        product_embedding_index.remove(product_id)
         return bool(result.data)
 
     async def get_products_by_category(self, category_id: int) -> List[Product]:
         """Get all products in a specific category."""
-        # Get products in the category
-        products_result = self.supabase.table('products')\
-            .select('*')\
-            .eq('category_id', category_id)\
-            .execute()
-        
-        if not products_result.data:
-            return []
-
-        product_ids = [p['id'] for p in products_result.data]
-        
-        # Get specs and labels using the same optimization as list_products
-        specs_result = self.supabase.table('product_specs')\
-            .select('*')\
-            .in_('product_id', product_ids)\
-            .execute()
-        
-        specs_map = {}
-        for spec in specs_result.data:
-            product_id = spec['product_id']
-            if product_id not in specs_map:
-                specs_map[product_id] = {}
-            specs_map[product_id][spec['spec_key']] = spec['spec_value']
-
-        labels_result = self.supabase.table('product_labels')\
-            .select('product_id, labels(name)')\
-            .in_('product_id', product_ids)\
-            .execute()
-        
-        labels_map = {}
-        for label_rel in labels_result.data:
-            product_id = label_rel['product_id']
-            if label_rel.get('labels') and label_rel['labels'].get('name'):
-                if product_id not in labels_map:
-                    labels_map[product_id] = []
-                labels_map[product_id].append(label_rel['labels']['name'])
-
-        return [
-            self._process_product_data(product_data, specs_map, labels_map)
-            for product_data in products_result.data
-        ]
+        snapshot = await catalog_cache.get(self.load_catalog)
+        return snapshot.in_category(category_id)
 
     async def get_products_by_label(self, label_name: str) -> List[Product]:
         """Get all products with a specific label."""
-        # Get products with the specified label
-        products_result = self.supabase.table('product_labels')\
-            .select('products(*)')\
-            .eq('labels.name', label_name)\
-            .execute()
-        
-        if not products_result.data:
-            return []
+        snapshot = await catalog_cache.get(self.load_catalog)
+        index = ProductFacetIndex.for_snapshot(snapshot)
+        return index.products_for(index.label_bits.get(label_name, 0))
+
+    async def filter_products(
+        self,
+        labels: Optional[List[str]] = None,
+        match_all_labels: bool = True,
+        category_ids: Optional[List[int]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock_only: bool = False,
+        limit: int = 50,
+        offset: int = 0
+    ) -> FacetedProductsResponse:
+        """Filter products on several attributes and count their facets."""
+        snapshot = await catalog_cache.get(self.load_catalog)
+        index = ProductFacetIndex.for_snapshot(snapshot)
+        bits = index.match(
+            labels=labels,
+            match_all_labels=match_all_labels,
+            category_ids=category_ids,
+            min_price=min_price,
+            max_price=max_price,
+            in_stock_only=in_stock_only
+        )
+        matched = index.products_for(bits)
+        return FacetedProductsResponse(
+            total=len(matched),
+            items=matched[offset:offset + limit],
+            facets=index.facets(bits)
+        )
 
-        # Extract product data and IDs
-        products_data = [
-            item['products'] for item in products_result.data 
-            if item.get('products')
+    async def search_products(self, query: str, limit: int = 20) -> List[ProductSearchHit]:
+        """Search products by name, description, spec values and labels."""
+        snapshot = await catalog_cache.get(self.load_catalog)
+        product_search_index.sync(snapshot)
+        return [
+            ProductSearchHit(score=score, product=product)
+            for product, score in product_search_index.search(query, limit)
         ]
-        product_ids = [p['id'] for p in products_data]
-
-        if not product_ids:
-            return []
-        
-        # Get specs and labels using the same optimization as list_products
-        specs_result = self.supabase.table('product_specs')\
-            .select('*')\
-            .in_('product_id', product_ids)\
-            .execute()
-        
-        specs_map = {}
-        for spec in specs_result.data:
-            product_id = spec['product_id']
-            if product_id not in specs_map:
-                specs_map[product_id] = {}
-            specs_map[product_id][spec['spec_key']] = spec['spec_value']
-
-        labels_result = self.supabase.table('product_labels')\
-            .select('product_id, labels(name)')\
-            .in_('product_id', product_ids)\
-            .execute()
-        
-        labels_map = {}
-        for label_rel in labels_result.data:
-            product_id = label_rel['product_id']
-            if label_rel.get('labels') and label_rel['labels'].get('name'):
-                if product_id not in labels_map:
-                    labels_map[product_id] = []
-                labels_map[product_id].append(label_rel['labels']['name'])
 
+    async def get_similar_products(self, product_id: int, limit: int = 10) -> List[ProductSearchHit]:
+        """Get the products closest in content to a product."""
+        neighbours = product_embedding_index.similar(product_id, limit)
+        products = await self.get_products_by_ids([neighbour_id for neighbour_id, _ in neighbours])
         return [
-            self._process_product_data(product_data, specs_map, labels_map)
-            for product_data in products_data
-        ] 
\ No newline at end of file
+            ProductSearchHit(score=score, product=products[neighbour_id])
+            for neighbour_id, score in neighbours
+            if neighbour_id in products
+        ]
@@ -1,9 +1,18 @@
+import time
 from typing import List
 import numpy as np
 from datetime import datetime
+from postgrest.types import ReturnMethod
 from app.db.supabase import get_supabase_client
 from app.models.product import Product
-from app.models.recommendation import RecommendationType, ProductRecommendation, ProductRecommendationResponse
+from app.models.recommendation import (
+    RECOMMENDATION_CHUNK_SIZE,
+    RECOMMENDATION_WITH_NAME,
+    RecommendationType,
+    RecommendationWriteSummary,
+    ProductRecommendationResponse
+)
+from app.services.catalog_columns import CatalogColumns
 
 class RecommendationService:
     def __init__(self):
@@ -18,16 +27,9 @@ class RecommendationService:
             products.append(Product(**item))
         return products
 
-    def calculate_product_features(self, product: Product) -> np.ndarray:
-        features = np.array([
-            float(product.price),
-            len(product.description),
-            product.rating or 0.0,
-            product.stock,
-            len(product.specs or {}),
-            len(product.labels or [])
-        ])
-        return features
+    def calculate_product_features(self, columns: CatalogColumns) -> np.ndarray:
+        """Get the feature matrix of every product, one row per product."""
+        return columns.feature_matrix()
 
     def classify_recommendation(self, score: float) -> RecommendationType:
         if score >= 150:
@@ -37,69 +39,70 @@ class RecommendationService:
         else:
             return RecommendationType.NOT_RECOMMENDED
 
-    def update_recommendations(self):
-        products = self.get_all_products()
-        
-        recommendations = []
-        for product in products:
-            features = self.calculate_product_features(product)
-            
-            score = np.mean(features)
-            
-            rec_type = self.classify_recommendation(score)
-            
-            recommendation = ProductRecommendation(
-                product_id=product.id,
-                recommendation_type=rec_type,
-                score=float(score),
-                updated_at=datetime.now()
-            )
-            recommendations.append(recommendation)
+    def update_recommendations(self) -> RecommendationWriteSummary:
+        started = time.perf_counter()
+        columns = CatalogColumns.from_products(self.get_all_products())
+        scores = self.calculate_product_features(columns).mean(axis=1)
+        batch = [
+            (product_id, self.classify_recommendation(score), score)
+            for product_id, score in zip(columns.ids.tolist(), scores.tolist())
+        ]
 
-        for rec in recommendations:
-            self.supabase.table('product_recommendations').upsert({
-                'product_id': rec.product_id,
-                'recommendation_type': rec.recommendation_type,
-                'score': rec.score,
-                'updated_at': rec.updated_at.isoformat()
-            }).execute()
+        # Only send rows whose stored type or score changed
+        stored = {}
+        for start in range(0, len(batch), RECOMMENDATION_CHUNK_SIZE):
+            chunk_ids = [product_id for product_id, _, _ in batch[start:start + RECOMMENDATION_CHUNK_SIZE]]
+            response = self.supabase.table('product_recommendations') \
+                .select('product_id, recommendation_type, score') \
+                .in_('product_id', chunk_ids).execute()
+            stored.update({
+                row['product_id']: (row['recommendation_type'], row['score'])
+                for row in response.data
+            })
 
-    def get_recommendations(self) -> List[ProductRecommendationResponse]:
-        query = """
-        SELECT pr.*, p.name as product_name 
-        FROM product_recommendations pr
-        JOIN products p ON p.id = pr.product_id
-        ORDER BY pr.score DESC
-        """
-        response = self.supabase.table('product_recommendations').select("*").execute()
-        
-        recommendations = []
-        for rec in response.data:
-            product_data = self.supabase.table('products').select("name").eq('id', rec['product_id']).single().execute()
-            recommendations.append(
-                ProductRecommendationResponse(
-                    product_id=rec['product_id'],
-                    product_name=product_data.data['name'],
-                    recommendation_type=rec['recommendation_type'],
-                    score=rec['score'],
-                    updated_at=rec['updated_at']
-                )
-            )
-        return recommendations
+        updated_at = datetime.now().isoformat()
+        rows = [
+            {
+                'product_id': product_id,
+                'recommendation_type': rec_type,
+                'score': score,
+                'updated_at': updated_at
+            }
+            for product_id, rec_type, score in batch
+            if stored.get(product_id) != (rec_type, score)
+        ]
+        for start in range(0, len(rows), RECOMMENDATION_CHUNK_SIZE):
+            self.supabase.table('product_recommendations').upsert(
+                rows[start:start + RECOMMENDATION_CHUNK_SIZE],
+                on_conflict='product_id',
+                returning=ReturnMethod.minimal
+            ).execute()
 
-    def get_recommendations_by_type(self, rec_type: str) -> List[ProductRecommendationResponse]:
-        response = self.supabase.table('product_recommendations').select("*").eq('recommendation_type', rec_type).execute()
-        
-        recommendations = []
-        for rec in response.data:
-            product_data = self.supabase.table('products').select("name").eq('id', rec['product_id']).single().execute()
-            recommendations.append(
-                ProductRecommendationResponse(
-                    product_id=rec['product_id'],
-                    product_name=product_data.data['name'],
-                    recommendation_type=rec['recommendation_type'],
-                    score=rec['score'],
-                    updated_at=rec['updated_at']
-                )
-            )
-        return recommendations
\ No newline at end of file
+        return RecommendationWriteSummary(
+            scored=len(batch),
+            written=len(rows),
+            unchanged=len(batch) - len(rows),
+            elapsed_seconds=round(time.perf_counter() - started, 3)
+        )
+
+    def get_recommendations(self, limit: int = 50, offset: int = 0) -> List[ProductRecommendationResponse]:
+        """Get recommendations by descending score with their product names."""
+        response = self.supabase.table('product_recommendations') \
+            .select(RECOMMENDATION_WITH_NAME) \
+            .order('score', desc=True).order('product_id') \
+            .range(offset, offset + limit - 1).execute()
+        return [ProductRecommendationResponse.from_row(rec) for rec in response.data]
+
+    def get_recommendations_by_type(
+        self,
+        rec_type: str,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[ProductRecommendationResponse]:
+        """Get recommendations of one type by descending score with their product names."""
+        response = self.supabase.table('product_recommendations') \
+            .select(RECOMMENDATION_WITH_NAME) \
+            .eq('recommendation_type', rec_type) \
+            .order('score', desc=True).order('product_id') \
+            .range(offset, offset + limit - 1).execute()
+        return [ProductRecommendationResponse.from_row(rec) for rec in response.data]
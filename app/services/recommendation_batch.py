@@ -0,0 +1,257 @@
+"""Batch generation of every user's recommendations over a process pool."""
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+from pydantic import BaseModel
+from app.core.config import get_settings
+from app.db.supabase import execute, get_supabase
+from app.services.ai_recommendation_service import calculate_content_scores, top_products
+from app.services.catalog_columns import SCORING_ARRAYS, CatalogColumns
+from app.services.model_store import load_arrays, publish_arrays
+from app.services.preference_profile_service import PreferenceProfileService, preferences_from_profile
+from app.services.product_service import ProductService
+from app.services.recommendation_service import RankedProducts, RecommendationService
+
+logger = logging.getLogger(__name__)
+
+# Rows read per request when listing users
+USER_PAGE_SIZE = 1000
+# Profiles built concurrently for users whose history predates profiles
+BACKFILL_CONCURRENCY = 16
+
+# Catalog and settings of a pool worker, set once when the worker starts
+_worker_columns: Optional[CatalogColumns] = None
+_worker_limit = 0
+
+def _init_worker(directory: str, version: str, limit: int) -> None:
+    """Map the published catalog in the worker for every batch."""
+    global _worker_columns, _worker_limit
+    arrays = load_arrays(Path(directory), version, SCORING_ARRAYS)
+    _worker_columns = CatalogColumns.from_scoring_arrays(dict(zip(SCORING_ARRAYS, arrays)))
+    _worker_limit = limit
+
+def _score_batch(profiles: List[Dict]) -> Dict[int, RankedProducts]:
+    """Rank the catalog for a batch of user profiles."""
+    preferences = [preferences_from_profile(profile) for profile in profiles]
+    scores = calculate_content_scores(preferences, _worker_columns)
+    return {
+        profile['user_id']: top_products(_worker_columns, user_scores, _worker_limit)
+        for profile, user_scores in zip(profiles, scores)
+    }
+
+class BatchProgress(BaseModel):
+    """Counters of a batch run, saved as its checkpoint."""
+    last_user_id: int = 0
+    users: int = 0
+    written: int = 0
+    unchanged: int = 0
+
+class RecommendationBatchRunner:
+    """Regenerates every user's recommendations in parallel.
+
+    The catalog is loaded once and published as .npy files next to the
+    checkpoint. Workers are spawned fresh rather than forked from the
+    parent's running threads, and map those files, so they share the
+    arrays through the page cache without copying them. Profiles are
+    streamed in user id order, scored in worker processes and written in
+    bulk by the parent. After each contiguous run of finished batches the
+    highest written user id is checkpointed with the counters, so a failed
+    run resumes where it stopped.
+    """
+
+    def __init__(self, checkpoint_path: Path):
+        """Initialize runner with dependencies."""
+        self.supabase = get_supabase()
+        self.checkpoint_path = Path(checkpoint_path)
+        self.product_service = ProductService()
+        self.profile_service = PreferenceProfileService()
+        self.recommendation_service = RecommendationService()
+
+    async def run(
+        self,
+        max_workers: int,
+        batch_size: int,
+        restart: bool = False,
+        backfill: bool = False,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> BatchProgress:
+        """Generate recommendations of every user not done by a previous run.
+
+        ``backfill`` first builds profiles of users who have history but no
+        profile at all, which reads every interaction row. Profiles not yet
+        backfilled have their history folded in as their page is read.
+        ``on_progress`` is called with the number of users just finished and
+        the total of this run.
+        """
+        progress = BatchProgress() if restart else self._read_checkpoint()
+        if backfill:
+            await self._backfill_profiles()
+
+        columns = CatalogColumns.from_products(await self.product_service.load_catalog())
+        catalog_dir = self.catalog_dir
+        version = publish_arrays(catalog_dir, columns.scoring_arrays()).name
+        total = await self._count_profiles(progress.last_user_id)
+        limit = get_settings().RECOMMENDATIONS_TOP_K
+
+        try:
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(str(catalog_dir), version, limit)
+            ) as pool:
+                await self._run_batches(pool, progress, batch_size, max_workers, total, on_progress)
+        finally:
+            shutil.rmtree(catalog_dir, ignore_errors=True)
+
+        self.checkpoint_path.unlink(missing_ok=True)
+        logger.info(
+            "Generated recommendations of %d users, %d written, %d unchanged",
+            progress.users, progress.written, progress.unchanged
+        )
+        return progress
+
+    @property
+    def catalog_dir(self) -> Path:
+        """Directory the catalog is published to for the workers."""
+        return self.checkpoint_path.with_name(f'{self.checkpoint_path.stem}-catalog')
+
+    async def _run_batches(
+        self,
+        pool: ProcessPoolExecutor,
+        progress: BatchProgress,
+        batch_size: int,
+        max_workers: int,
+        total: int,
+        on_progress: Optional[Callable[[int, int], None]]
+    ) -> None:
+        """Score every remaining profile page in the pool and save the results."""
+        loop = asyncio.get_running_loop()
+        running: Dict[asyncio.Future, int] = {}
+        # Last user id of each batch not yet covered by the checkpoint
+        batch_ends: Dict[int, int] = {}
+        # Counters of finished batches, added to the checkpoint with their users
+        finished: Dict[int, BatchProgress] = {}
+        next_batch = next_to_checkpoint = 0
+        last_user_id = progress.last_user_id
+        exhausted = False
+
+        while not exhausted or running:
+            # Keep every worker busy with one batch queued behind it
+            while not exhausted and len(running) < max_workers * 2:
+                profiles = await self._profile_page(last_user_id, batch_size)
+                if not profiles:
+                    exhausted = True
+                    break
+                last_user_id = profiles[-1]['user_id']
+                running[loop.run_in_executor(pool, _score_batch, profiles)] = next_batch
+                batch_ends[next_batch] = last_user_id
+                next_batch += 1
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                ranked = future.result()
+                summary = await self.recommendation_service.save_user_recommendations(ranked)
+                finished[running.pop(future)] = BatchProgress(
+                    users=len(ranked),
+                    written=summary.written,
+                    unchanged=summary.unchanged
+                )
+                if on_progress:
+                    on_progress(len(ranked), total)
+
+            # Only a contiguous prefix of finished batches is safe to skip,
+            # and only its counts are saved, so a resumed run never recounts
+            while next_to_checkpoint in finished:
+                batch = finished.pop(next_to_checkpoint)
+                progress.users += batch.users
+                progress.written += batch.written
+                progress.unchanged += batch.unchanged
+                progress.last_user_id = batch_ends.pop(next_to_checkpoint)
+                next_to_checkpoint += 1
+            self._write_checkpoint(progress)
+
+    async def _profile_page(self, after_user_id: int, limit: int) -> List[Dict]:
+        """Get the next page of profiles in user id order, backfilling them as needed."""
+        result = await execute(
+            self.supabase.table('user_preference_profiles')
+            .select('*')
+            .gt('user_id', after_user_id)
+            .order('user_id')
+            .limit(limit)
+        )
+        profiles = result.data or []
+        semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+        async def backfilled(profile: Dict) -> Dict:
+            if profile.get('backfilled'):
+                return profile
+            async with semaphore:
+                return await self.profile_service.build_from_history(profile['user_id']) or profile
+
+        return list(await asyncio.gather(*(backfilled(profile) for profile in profiles)))
+
+    async def _count_profiles(self, after_user_id: int) -> int:
+        """Count the profiles left to process."""
+        result = await execute(
+            self.supabase.table('user_preference_profiles')
+            .select('user_id', count='exact')
+            .gt('user_id', after_user_id)
+            .limit(1)
+        )
+        return result.count or 0
+
+    async def _backfill_profiles(self) -> None:
+        """Build profiles of users who only have interaction history."""
+        profiled = await self._distinct_users('user_preference_profiles')
+        missing = (
+            await self._distinct_users('user_views') |
+            await self._distinct_users('user_purchases')
+        ) - profiled
+        if not missing:
+            return
+
+        logger.info("Building preference profiles of %d users from history", len(missing))
+        semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+        async def build(user_id: int) -> None:
+            async with semaphore:
+                await self.profile_service.build_from_history(user_id)
+
+        await asyncio.gather(*(build(user_id) for user_id in sorted(missing)))
+
+    async def _distinct_users(self, table: str) -> Set[int]:
+        """Get every user id present in a table."""
+        user_ids: Set[int] = set()
+        start = 0
+        while True:
+            result = await execute(
+                self.supabase.table(table)
+                .select('user_id')
+                .order('user_id')
+                .range(start, start + USER_PAGE_SIZE - 1)
+            )
+            user_ids.update(row['user_id'] for row in result.data)
+            if len(result.data) < USER_PAGE_SIZE:
+                return user_ids
+            start += USER_PAGE_SIZE
+
+    def _read_checkpoint(self) -> BatchProgress:
+        """Get the progress saved by an interrupted run."""
+        try:
+            return BatchProgress.model_validate_json(self.checkpoint_path.read_text())
+        except FileNotFoundError:
+            return BatchProgress()
+
+    def _write_checkpoint(self, progress: BatchProgress) -> None:
+        """Save progress atomically."""
+        temporary = self.checkpoint_path.with_suffix('.tmp')
+        temporary.write_text(progress.model_dump_json())
+        os.replace(temporary, self.checkpoint_path)
@@ -0,0 +1,121 @@
+"""Background recommendation generation jobs."""
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Set
+from urllib.parse import urlsplit
+import httpx
+from app.core.config import get_settings
+from app.models.recommendation import JobStatus, RecommendationJob
+from app.services.ai_recommendation_service import AIRecommendationService
+
+logger = logging.getLogger(__name__)
+
+class RecommendationJobManager:
+    """Runs recommendation generation off the request path.
+
+    At most ``RECOMMENDATION_JOB_WORKERS`` jobs score at the same time and
+    later ones wait as pending. A user has at most one active job: asking
+    again while one is pending or running returns that job instead of
+    starting another. Finished jobs are kept for status polling, up to
+    ``RECOMMENDATION_JOB_HISTORY`` of them.
+    """
+
+    def __init__(self):
+        """Initialize without jobs."""
+        self._jobs: "OrderedDict[str, RecommendationJob]" = OrderedDict()
+        self._active: Dict[int, str] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent jobs, created on the running loop."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(get_settings().RECOMMENDATION_JOB_WORKERS)
+        return self._semaphore
+
+    def submit(self, user_id: int, callback_url: Optional[str] = None) -> RecommendationJob:
+        """Queue a generation job for a user, reusing an active one.
+
+        Raises ValueError when the callback URL is not an http(s) URL on
+        one of the ``RECOMMENDATION_CALLBACK_HOSTS``.
+        """
+        if callback_url is not None and not _is_allowed_callback(callback_url):
+            raise ValueError("Callback URL is not allowed")
+        active_id = self._active.get(user_id)
+        if active_id is not None:
+            return self._jobs[active_id]
+
+        job = RecommendationJob(
+            job_id=uuid.uuid4().hex,
+            user_id=user_id,
+            callback_url=callback_url,
+            created_at=datetime.utcnow()
+        )
+        self._jobs[job.job_id] = job
+        self._active[user_id] = job.job_id
+        self._prune()
+
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[RecommendationJob]:
+        """Get a job by ID."""
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: RecommendationJob) -> None:
+        """Generate a user's recommendations once a worker slot is free."""
+        try:
+            async with self.semaphore:
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.utcnow()
+                job.summary = await AIRecommendationService().generate_recommendations(job.user_id)
+                job.status = JobStatus.SUCCEEDED
+        except Exception as e:
+            logger.exception("Recommendation job %s failed", job.job_id)
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._active.pop(job.user_id, None)
+
+        if job.callback_url:
+            await self._notify(job)
+
+    async def _notify(self, job: RecommendationJob) -> None:
+        """POST the finished job to its callback URL."""
+        try:
+            async with httpx.AsyncClient(
+                timeout=get_settings().RECOMMENDATION_CALLBACK_TIMEOUT
+            ) as client:
+                response = await client.post(job.callback_url, json=job.model_dump(mode='json'))
+                response.raise_for_status()
+        except httpx.HTTPError:
+            logger.warning("Callback for recommendation job %s failed", job.job_id, exc_info=True)
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond the history size."""
+        excess = len(self._jobs) - get_settings().RECOMMENDATION_JOB_HISTORY
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status in (JobStatus.SUCCEEDED, JobStatus.FAILED):
+                del self._jobs[job_id]
+                excess -= 1
+
+def _is_allowed_callback(url: str) -> bool:
+    """Check that a callback URL is http(s) on an allowed host."""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return False
+    allowed = {host.lower() for host in get_settings().RECOMMENDATION_CALLBACK_HOSTS}
+    return parts.scheme in ('http', 'https') and parts.hostname in allowed
+
+# Create singleton instance
+recommendation_jobs = RecommendationJobManager()
@@ -1,8 +1,39 @@
 """Recommendation service with Supabase integration."""
+import asyncio
+import bisect
+import logging
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
-from app.db.supabase import get_supabase
-from app.models.recommendation import RecommendationType, ProductRecommendation, UserRecommendations
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from postgrest.types import ReturnMethod
+from app.db.supabase import execute, get_supabase
+from app.models.recommendation import (
+    RECOMMENDATION_CHUNK_SIZE,
+    RECOMMENDATION_WITH_NAME,
+    RecommendationType,
+    RecommendationWriteSummary,
+    ProductRecommendation,
+    ProductRecommendationResponse,
+    UserRecommendations
+)
+
+logger = logging.getLogger(__name__)
+
+# Lowest scores of the highly recommended and recommended tiers
+HIGHLY_RECOMMENDED_SCORE = 0.7
+RECOMMENDED_SCORE = 0.4
+# Products returned per user unless asked otherwise
+USER_RECOMMENDATIONS_LIMIT = 12
+# Tiers from best to worst
+RECOMMENDATION_TIERS = (
+    RecommendationType.HIGHLY_RECOMMENDED,
+    RecommendationType.RECOMMENDED,
+    RecommendationType.NOT_RECOMMENDED
+)
+
+# A user's ranked products: product ids and their scores, best first
+RankedProducts = Tuple[List[int], List[float]]
 
 class RecommendationService:
     """Service for managing product recommendations."""
@@ -11,38 +42,148 @@ class RecommendationService:
         """Initialize service with Supabase client."""
         self.supabase = get_supabase()
 
-    async def get_user_recommendations(self, user_id: int) -> UserRecommendations:
-        """Get recommendations for a user."""
-        # Get all recommendations ordered by score
-        result = self.supabase.table('product_recommendations')\
-            .select('*')\
-            .order('score', desc=True)\
-            .execute()
+    async def get_user_recommendations(
+        self,
+        user_id: int,
+        limit: int = USER_RECOMMENDATIONS_LIMIT,
+        tiers: Optional[Iterable[RecommendationType]] = None,
+        per_tier: Optional[int] = None
+    ) -> UserRecommendations:
+        """Get the best of a user's recommendations grouped by tier.
 
-        if not result.data:
-            return UserRecommendations(updated_at=datetime.utcnow())
-
-        # Group products by recommendation type
-        recommendations = UserRecommendations(
-            highly_recommended=[],
-            recommended=[],
-            not_recommended=[],
-            updated_at=datetime.utcnow()
+        Tiers are filled best first until ``limit`` products are returned,
+        each with at most ``per_tier`` of them, and only ``tiers`` are
+        returned when given. Users without stored recommendations get the
+        top of the catalog-wide ones.
+        """
+        tiers = [tier for tier in RECOMMENDATION_TIERS if tiers is None or tier in tiers]
+        cap = min(limit, per_tier or limit)
+
+        result = await execute(
+            self.supabase.table('user_recommendations')
+            .select('product_ids, scores, updated_at')
+            .eq('user_id', user_id)
+        )
+        if not result.data or not result.data[0]['product_ids']:
+            return await self._get_catalog_recommendations(tiers, limit, cap)
+
+        row = result.data[0]
+        product_ids, scores = row['product_ids'], row['scores']
+        # Products are stored best first, so each tier is a contiguous run
+        descending = [-score for score in scores]
+        bounds = [0] + [
+            bisect.bisect_right(descending, -threshold)
+            for threshold in (HIGHLY_RECOMMENDED_SCORE, RECOMMENDED_SCORE)
+        ] + [len(scores)]
+        candidates = {
+            tier: product_ids[start:min(end, start + cap)]
+            for tier, start, end in zip(RECOMMENDATION_TIERS, bounds, bounds[1:])
+            if tier in tiers
+        }
+        return _fill_tiers(candidates, limit, row['updated_at'])
+
+    async def _get_catalog_recommendations(
+        self,
+        tiers: List[RecommendationType],
+        limit: int,
+        cap: int
+    ) -> UserRecommendations:
+        """Get the top catalog-wide recommendations of each tier."""
+        results = await asyncio.gather(*(
+            execute(
+                self.supabase.table('product_recommendations')
+                .select('product_id, updated_at')
+                .eq('recommendation_type', tier)
+                .order('score', desc=True)
+                .order('product_id')
+                .limit(cap)
+            )
+            for tier in tiers
+        ))
+        updated_at = max(
+            (item['updated_at'] for result in results for item in result.data),
+            default=None
         )
+        candidates = {
+            tier: [item['product_id'] for item in result.data]
+            for tier, result in zip(tiers, results)
+        }
+        return _fill_tiers(candidates, limit, updated_at)
+
+    async def save_user_recommendations(
+        self,
+        recommendations: Dict[int, RankedProducts]
+    ) -> RecommendationWriteSummary:
+        """Store the ranked products of many users with chunked upserts.
 
-        for item in result.data:
-            score = item['score']
-            product_id = item['product_id']
-            
-            # Classify based on score
-            if score >= 0.7:
-                recommendations.highly_recommended.append(product_id)
-            elif score >= 0.4:
-                recommendations.recommended.append(product_id)
-            else:
-                recommendations.not_recommended.append(product_id)
+        Each user is one row holding parallel product id and score arrays.
+        Users whose stored ranking is unchanged are skipped. Users ranking
+        no product have their row removed, so they are served the
+        catalog-wide recommendations.
+        """
+        started = time.perf_counter()
+        user_ids = list(recommendations)
+        stored = {}
+        for start in range(0, len(user_ids), RECOMMENDATION_CHUNK_SIZE):
+            result = await execute(
+                self.supabase.table('user_recommendations')
+                .select('user_id, product_ids, scores')
+                .in_('user_id', user_ids[start:start + RECOMMENDATION_CHUNK_SIZE])
+            )
+            stored.update({
+                row['user_id']: (row['product_ids'], row['scores'])
+                for row in result.data
+            })
 
-        return recommendations
+        updated_at = datetime.utcnow().isoformat()
+        rows = []
+        emptied = []
+        for user_id, (product_ids, scores) in recommendations.items():
+            if not len(product_ids):
+                if user_id in stored:
+                    emptied.append(user_id)
+                continue
+            # Scores are stored as REAL, so compare them at that precision
+            scores = np.asarray(scores, dtype=np.float32)
+            previous = stored.get(user_id)
+            if previous is not None and previous[0] == list(product_ids) and \
+                    np.array_equal(np.asarray(previous[1], dtype=np.float32), scores):
+                continue
+            rows.append({
+                'user_id': user_id,
+                'product_ids': list(product_ids),
+                'scores': scores.tolist(),
+                'updated_at': updated_at
+            })
+
+        for start in range(0, len(rows), RECOMMENDATION_CHUNK_SIZE):
+            await execute(
+                self.supabase.table('user_recommendations')
+                .upsert(
+                    rows[start:start + RECOMMENDATION_CHUNK_SIZE],
+                    on_conflict='user_id',
+                    returning=ReturnMethod.minimal
+                )
+            )
+        for start in range(0, len(emptied), RECOMMENDATION_CHUNK_SIZE):
+            await execute(
+                self.supabase.table('user_recommendations')
+                .delete(returning=ReturnMethod.minimal)
+                .in_('user_id', emptied[start:start + RECOMMENDATION_CHUNK_SIZE])
+            )
+
+        written = len(rows) + len(emptied)
+        summary = RecommendationWriteSummary(
+            scored=len(recommendations),
+            written=written,
+            unchanged=len(recommendations) - written,
+            elapsed_seconds=round(time.perf_counter() - started, 3)
+        )
+        logger.info(
+            "Wrote recommendations of %d of %d users in %.3fs",
+            summary.written, summary.scored, summary.elapsed_seconds
+        )
+        return summary
 
     async def update_product_recommendation(
         self,
@@ -58,9 +199,10 @@ class RecommendationService:
             'updated_at': datetime.utcnow().isoformat()
         }
 
-        result = self.supabase.table('product_recommendations')\
-            .upsert(data, on_conflict='product_id')\
-            .execute()
+        result = await execute(
+            self.supabase.table('product_recommendations')
+            .upsert(data, on_conflict='product_id')
+        )
 
         if not result.data:
             return None
@@ -72,10 +214,11 @@ class RecommendationService:
         product_id: int
     ) -> Optional[ProductRecommendation]:
         """Get recommendation for a specific product."""
-        result = self.supabase.table('product_recommendations')\
-            .select('*')\
-            .eq('product_id', product_id)\
-            .execute()
+        result = await execute(
+            self.supabase.table('product_recommendations')
+            .select('*')
+            .eq('product_id', product_id)
+        )
 
         if not result.data:
             return None
@@ -84,13 +227,52 @@ class RecommendationService:
 
     async def get_recommendations_by_type(
         self,
-        recommendation_type: RecommendationType
+        recommendation_type: RecommendationType,
+        limit: int = 50,
+        offset: int = 0
     ) -> List[ProductRecommendation]:
-        """Get all products with a specific recommendation type."""
-        result = self.supabase.table('product_recommendations')\
-            .select('*')\
-            .eq('recommendation_type', recommendation_type)\
-            .order('score', desc=True)\
-            .execute()
-
-        return [ProductRecommendation(**item) for item in result.data] 
\ No newline at end of file
+        """Get a page of products with a specific recommendation type."""
+        result = await execute(
+            self.supabase.table('product_recommendations')
+            .select('*')
+            .eq('recommendation_type', recommendation_type)
+            .order('score', desc=True)
+            .order('product_id')
+            .range(offset, offset + limit - 1)
+        )
+
+        return [ProductRecommendation(**item) for item in result.data]
+
+    async def list_recommendations(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        recommendation_type: Optional[RecommendationType] = None
+    ) -> List[ProductRecommendationResponse]:
+        """Get a page of recommendations by descending score with product names."""
+        query = self.supabase.table('product_recommendations').select(RECOMMENDATION_WITH_NAME)
+        if recommendation_type:
+            query = query.eq('recommendation_type', recommendation_type)
+        result = await execute(
+            query
+            .order('score', desc=True)
+            .order('product_id')
+            .range(offset, offset + limit - 1)
+        )
+
+        return [ProductRecommendationResponse.from_row(item) for item in result.data]
+
+def _fill_tiers(
+    candidates: Dict[RecommendationType, List[int]],
+    limit: int,
+    updated_at: Optional[datetime]
+) -> UserRecommendations:
+    """Take the best candidates of each tier, best tier first, up to a limit."""
+    recommendations = UserRecommendations(updated_at=updated_at or datetime.utcnow())
+    remaining = limit
+    for tier in RECOMMENDATION_TIERS:
+        if tier in candidates:
+            taken = candidates[tier][:remaining]
+            setattr(recommendations, tier.value, taken)
+            remaining -= len(taken)
+    return recommendations
@@ -0,0 +1,174 @@
+"""Write-behind buffering of tracked views and purchases."""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from postgrest.types import ReturnMethod
+from app.core.config import get_settings
+from app.db.supabase import execute, get_supabase
+from app.services.preference_profile_service import PreferenceProfileService
+
+logger = logging.getLogger(__name__)
+
+# Attempts at writing a batch before its events are dropped
+FLUSH_ATTEMPTS = 3
+# Seconds before the first retry, doubled on each further one
+RETRY_DELAY = 0.5
+
+VIEW = 'view'
+PURCHASE = 'purchase'
+
+# A tracked event: kind, user id, product id and time
+TrackedEvent = Tuple[str, int, int, datetime]
+
+class TrackingBuffer:
+    """Collects tracked events in process and writes them in batches.
+
+    Requests only enqueue their event. A single consumer takes events off a
+    bounded queue and flushes when ``TRACKING_BATCH_SIZE`` events are
+    pending or ``TRACKING_FLUSH_SECONDS`` after the first one arrived. Within
+    a batch, views of the same (user, product) pair become one count
+    increment with the latest view time, and the preference updates of a
+    pair are decayed to its newest event and summed, so each flush costs
+    one request per table whatever the traffic. When the queue is full,
+    tracking waits for the consumer to catch up instead of growing memory
+    without bound.
+    """
+
+    def __init__(self):
+        """Initialize without a running consumer."""
+        self._profile_service: Optional[PreferenceProfileService] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def supabase(self):
+        """Supabase client the events are written with."""
+        return get_supabase()
+
+    @property
+    def profile_service(self) -> PreferenceProfileService:
+        """Service updating preference profiles, created on first use."""
+        if self._profile_service is None:
+            self._profile_service = PreferenceProfileService()
+        return self._profile_service
+
+    async def start(self) -> None:
+        """Start the consumer on the running loop."""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=get_settings().TRACKING_QUEUE_SIZE)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write every queued event and stop the consumer."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def track_view(self, user_id: int, product_id: int) -> None:
+        """Record that a user viewed a product."""
+        await self._put(VIEW, user_id, product_id)
+
+    async def track_purchase(self, user_id: int, product_id: int) -> None:
+        """Record that a user purchased a product."""
+        await self._put(PURCHASE, user_id, product_id)
+
+    async def _put(self, kind: str, user_id: int, product_id: int) -> None:
+        """Queue an event, or write it at once when no consumer is running."""
+        event = (kind, user_id, product_id, datetime.now(timezone.utc))
+        if self._task is None:
+            await self._flush([event])
+        else:
+            await self._queue.put(event)
+
+    async def _run(self) -> None:
+        """Take events off the queue and flush them by size or time."""
+        settings = get_settings()
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            event = await self._queue.get()
+            if event is None:
+                break
+            batch = [event]
+            deadline = loop.time() + settings.TRACKING_FLUSH_SECONDS
+            while len(batch) < settings.TRACKING_BATCH_SIZE:
+                # Take what is already queued without waiting
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        event = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    event = self._queue.get_nowait()
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[TrackedEvent]) -> None:
+        """Coalesce a batch and write it, retrying failed writes."""
+        views: Dict[Tuple[int, int], Dict] = {}
+        purchases: List[Dict] = []
+        preferences: Dict[Tuple[int, int], List[datetime]] = defaultdict(list)
+        for kind, user_id, product_id, at in batch:
+            if kind == VIEW:
+                view = views.setdefault((user_id, product_id), {
+                    'user_id': user_id,
+                    'product_id': product_id,
+                    'view_count': 0,
+                    'viewed_at': at
+                })
+                view['view_count'] += 1
+                view['viewed_at'] = max(view['viewed_at'], at)
+            else:
+                purchases.append({
+                    'user_id': user_id,
+                    'product_id': product_id
+                })
+            preferences[(user_id, product_id)].append(at)
+
+        for view in views.values():
+            view['viewed_at'] = view['viewed_at'].isoformat()
+
+        writes = []
+        if views:
+            writes.append(self._write('views', lambda: execute(
+                self.supabase.rpc('record_product_views', {'p_views': list(views.values())})
+            )))
+        if purchases:
+            writes.append(self._write('purchases', lambda: execute(
+                self.supabase.table('user_purchases')
+                .insert(purchases, returning=ReturnMethod.minimal)
+            )))
+        writes.append(self._write(
+            'preference events', lambda: self.profile_service.record_events(preferences)
+        ))
+        await asyncio.gather(*writes)
+
+    async def _write(self, name: str, write) -> None:
+        """Run one write of a flush, retrying with backoff before giving up."""
+        delay = RETRY_DELAY
+        for attempt in range(1, FLUSH_ATTEMPTS + 1):
+            try:
+                await write()
+                return
+            except Exception:
+                if attempt == FLUSH_ATTEMPTS:
+                    logger.exception("Dropping tracked %s after %d attempts", name, attempt)
+                    return
+                logger.warning("Writing tracked %s failed, retrying in %.1fs", name, delay)
+                await asyncio.sleep(delay)
+                delay *= 2
+
+# Create singleton instance
+tracking_buffer = TrackingBuffer()
@@ -1,9 +1,16 @@
 """Command-line interface for the e-commerce chatbot."""
 
+import asyncio
 import os
 from langchain_core.messages import HumanMessage
 from .chatbot import create_chatbot, get_initial_message
 import click
+from app.core.config import get_settings
+from app.db.supabase import get_supabase_client
+from app.services.item_similarity import ItemSimilarityBuilder, fetch_interactions
+from app.services.product_embeddings import build_embedding_model
+from app.services.product_service import ProductService
+from app.services.recommendation_batch import RecommendationBatchRunner
 from app.services.recommendation import RecommendationService
 
 def check_api_key():
@@ -23,8 +30,61 @@ def update_recommendations():
     """Actualiza las recomendaciones de productos"""
     click.echo("Actualizando recomendaciones de productos...")
     service = RecommendationService()
-    service.update_recommendations()
+    summary = service.update_recommendations()
+    click.echo(
+        f"{summary.written} de {summary.scored} recomendaciones escritas "
+        f"en {summary.elapsed_seconds:.1f}s ({summary.unchanged} sin cambios)"
+    )
     click.echo("¡Recomendaciones actualizadas exitosamente!")
 
+@cli.command()
+@click.option('--full', is_flag=True, help="Descarta los conteos guardados y reconstruye desde cero")
+def build_similarity(full):
+    """Construye el modelo de productos similares a partir de vistas y compras"""
+    settings = get_settings()
+    builder = ItemSimilarityBuilder() if full else ItemSimilarityBuilder.load(settings.SIMILARITY_DIR)
+    click.echo("Leyendo interacciones de usuarios...")
+    user_ids, product_ids, builder.watermarks = fetch_interactions(
+        get_supabase_client(), builder.watermarks
+    )
+    added = builder.add_interactions(user_ids, product_ids)
+    model_dir = builder.publish(settings.SIMILARITY_DIR, settings.SIMILARITY_TOP_N)
+    click.echo(f"{added} interacciones nuevas procesadas, modelo publicado en {model_dir}")
+
+@cli.command()
+def build_embeddings():
+    """Calcula los vectores de contenido de los productos y su índice"""
+    settings = get_settings()
+    click.echo("Leyendo catálogo...")
+    products = asyncio.run(ProductService().load_catalog())
+    model_dir = build_embedding_model(products, settings.EMBEDDING_DIR, settings.EMBEDDING_DIMENSIONS)
+    click.echo(f"{len(products)} productos indexados, modelo publicado en {model_dir}")
+
+@cli.command()
+@click.option('--max-workers', default=os.cpu_count() or 1, show_default=True, help="Procesos de cálculo en paralelo")
+@click.option('--batch-size', default=200, show_default=True, help="Usuarios por lote")
+@click.option('--restart', is_flag=True, help="Ignora el punto de control y empieza desde el primer usuario")
+@click.option('--backfill-profiles', is_flag=True, help="Crea primero los perfiles de usuarios con historial antiguo")
+def generate_all_recommendations(max_workers, batch_size, restart, backfill_profiles):
+    """Genera las recomendaciones personalizadas de todos los usuarios"""
+    runner = RecommendationBatchRunner(get_settings().RECOMMENDATION_BATCH_CHECKPOINT)
+    runner.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    with click.progressbar(length=0, label="Generando recomendaciones") as bar:
+        def on_progress(users, total):
+            bar.length = total
+            bar.update(users)
+
+        progress = asyncio.run(runner.run(
+            max_workers=max_workers,
+            batch_size=batch_size,
+            restart=restart,
+            backfill=backfill_profiles,
+            on_progress=on_progress
+        ))
+    click.echo(
+        f"{progress.users} usuarios procesados: {progress.written} escritos, "
+        f"{progress.unchanged} sin cambios"
+    )
+
 if __name__ == '__main__':
     cli()
\ No newline at end of file
@@ -1,4 +1,6 @@
 -- First, drop existing tables in the correct order (due to foreign key constraints)
+DROP TABLE IF EXISTS user_preference_profiles;
+DROP TABLE IF EXISTS user_recommendations;
 DROP TABLE IF EXISTS product_recommendations;
 DROP TABLE IF EXISTS product_specs;
 DROP TABLE IF EXISTS product_labels;
@@ -64,4 +66,241 @@ CREATE TABLE IF NOT EXISTS product_recommendations (
 CREATE INDEX IF NOT EXISTS idx_product_recommendations_type 
     ON product_recommendations(recommendation_type);
 CREATE INDEX IF NOT EXISTS idx_product_recommendations_score 
-    ON product_recommendations(score); 
\ No newline at end of file
+    ON product_recommendations(score);
+
+-- Per-user recommendations, the top-K products of each user as parallel
+-- arrays ordered by descending score
+CREATE TABLE IF NOT EXISTS user_recommendations (
+    user_id INTEGER PRIMARY KEY,
+    product_ids INTEGER[] NOT NULL,
+    scores REAL[] NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Per-user preference profiles. Counters hold exponentially decayed event
+-- weights as of decay_epoch, the time of the newest event: a newer event
+-- first decays every counter to its own time, so counters never exceed
+-- the number of events. Only ratios between counters are meaningful.
+-- backfilled is set once the user's view and purchase history has been
+-- folded in; tracking creates profiles without it.
+CREATE TABLE IF NOT EXISTS user_preference_profiles (
+    user_id INTEGER PRIMARY KEY,
+    category_weights JSONB NOT NULL DEFAULT '{}',
+    label_weights JSONB NOT NULL DEFAULT '{}',
+    spec_weights JSONB NOT NULL DEFAULT '{}',
+    price_weight DOUBLE PRECISION NOT NULL DEFAULT 0,
+    price_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    price_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    event_count INTEGER NOT NULL DEFAULT 0,
+    decay_epoch TIMESTAMP WITH TIME ZONE,
+    backfilled BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc', NOW())
+);
+
+-- Multiply a weight by exp(-p_shift), giving NULL once it falls below
+-- p_epsilon. Working in log space keeps exp() and the product from
+-- underflowing however large the shift.
+DROP FUNCTION IF EXISTS scale_weights(JSONB, DOUBLE PRECISION);
+CREATE OR REPLACE FUNCTION rescale_weight(
+    p_weight DOUBLE PRECISION,
+    p_shift DOUBLE PRECISION,
+    p_epsilon DOUBLE PRECISION
+) RETURNS DOUBLE PRECISION AS $$
+    SELECT CASE
+        WHEN p_weight <= 0 THEN NULL
+        WHEN ln(p_weight) - p_shift < ln(p_epsilon) THEN NULL
+        ELSE exp(ln(p_weight) - p_shift)
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Rescale every weight of a flat or nested JSONB weight map, dropping the
+-- weights that fall below p_epsilon and the maps left empty
+CREATE OR REPLACE FUNCTION rescale_weights(
+    p_weights JSONB,
+    p_shift DOUBLE PRECISION,
+    p_epsilon DOUBLE PRECISION
+) RETURNS JSONB AS $$
+BEGIN
+    RETURN COALESCE((
+        SELECT jsonb_object_agg(key, scaled)
+        FROM (
+            SELECT key, CASE WHEN jsonb_typeof(value) = 'object'
+                THEN rescale_weights(value, p_shift, p_epsilon)
+                ELSE to_jsonb(rescale_weight((value #>> '{}')::DOUBLE PRECISION, p_shift, p_epsilon))
+            END AS scaled
+            FROM jsonb_each(p_weights)
+        ) weights
+        WHERE scaled IS NOT NULL AND scaled <> '{}'::JSONB
+    ), '{}');
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Apply tracked events with one product to a user's preference profile.
+-- p_weight is the summed weight of p_events coalesced events, decayed to
+-- p_at with time constant p_tau seconds.
+DROP FUNCTION IF EXISTS record_preference_event(
+    INTEGER, INTEGER, TEXT[], JSONB, DOUBLE PRECISION, DOUBLE PRECISION
+);
+DROP FUNCTION IF EXISTS record_preference_event(
+    INTEGER, INTEGER, TEXT[], JSONB, DOUBLE PRECISION, DOUBLE PRECISION, INTEGER
+);
+CREATE OR REPLACE FUNCTION record_preference_event(
+    p_user_id INTEGER,
+    p_category_id INTEGER,
+    p_labels TEXT[],
+    p_specs JSONB,
+    p_price DOUBLE PRECISION,
+    p_weight DOUBLE PRECISION,
+    p_events INTEGER,
+    p_at TIMESTAMP WITH TIME ZONE,
+    p_tau DOUBLE PRECISION
+) RETURNS VOID AS $$
+DECLARE
+    profile user_preference_profiles%ROWTYPE;
+    label_name TEXT;
+    spec RECORD;
+    shift DOUBLE PRECISION;
+    max_shift CONSTANT DOUBLE PRECISION := 10;
+    epsilon CONSTANT DOUBLE PRECISION := 1e-4;
+    -- Smallest sum kept, so price sums are only dropped with their weight
+    sum_epsilon CONSTANT DOUBLE PRECISION := 1e-300;
+BEGIN
+    INSERT INTO user_preference_profiles (user_id) VALUES (p_user_id)
+        ON CONFLICT (user_id) DO NOTHING;
+    SELECT * INTO profile FROM user_preference_profiles
+        WHERE user_id = p_user_id FOR UPDATE;
+
+    -- Counters are kept scaled to decay_epoch: an event adds its weight
+    -- times exp((p_at - decay_epoch) / tau), so stored counters are left
+    -- alone and only ratios between them are ever read. Once that factor
+    -- passes exp(max_shift) every counter is renormalized to p_at, dropping
+    -- those worth less than epsilon of a fresh event.
+    IF profile.decay_epoch IS NULL THEN
+        profile.decay_epoch := p_at;
+    END IF;
+    shift := EXTRACT(EPOCH FROM p_at - profile.decay_epoch) / p_tau;
+    IF shift > max_shift THEN
+        profile.category_weights := rescale_weights(profile.category_weights, shift, epsilon);
+        profile.label_weights := rescale_weights(profile.label_weights, shift, epsilon);
+        profile.spec_weights := rescale_weights(profile.spec_weights, shift, epsilon);
+        profile.price_weight := COALESCE(rescale_weight(profile.price_weight, shift, epsilon), 0);
+        IF profile.price_weight > 0 THEN
+            profile.price_sum := COALESCE(rescale_weight(profile.price_sum, shift, sum_epsilon), 0);
+            profile.price_sq_sum := COALESCE(rescale_weight(profile.price_sq_sum, shift, sum_epsilon), 0);
+        ELSE
+            profile.price_sum := 0;
+            profile.price_sq_sum := 0;
+        END IF;
+        profile.decay_epoch := p_at;
+        shift := 0;
+    END IF;
+    -- An event from well before decay_epoch adds nothing but its count
+    p_weight := COALESCE(rescale_weight(p_weight, -shift, epsilon), 0);
+
+    IF p_category_id IS NOT NULL AND p_weight > 0 THEN
+        profile.category_weights := jsonb_set(
+            profile.category_weights,
+            ARRAY[p_category_id::TEXT],
+            to_jsonb(COALESCE((profile.category_weights ->> p_category_id::TEXT)::DOUBLE PRECISION, 0) + p_weight)
+        );
+    END IF;
+
+    FOREACH label_name IN ARRAY CASE WHEN p_weight > 0 THEN COALESCE(p_labels, '{}') ELSE '{}' END LOOP
+        profile.label_weights := jsonb_set(
+            profile.label_weights,
+            ARRAY[label_name],
+            to_jsonb(COALESCE((profile.label_weights ->> label_name)::DOUBLE PRECISION, 0) + p_weight)
+        );
+    END LOOP;
+
+    FOR spec IN SELECT key, value FROM jsonb_each_text(COALESCE(p_specs, '{}')) WHERE p_weight > 0 LOOP
+        profile.spec_weights := jsonb_set(
+            profile.spec_weights,
+            ARRAY[spec.key],
+            COALESCE(profile.spec_weights -> spec.key, '{}')
+        );
+        profile.spec_weights := jsonb_set(
+            profile.spec_weights,
+            ARRAY[spec.key, spec.value],
+            to_jsonb(COALESCE((profile.spec_weights -> spec.key ->> spec.value)::DOUBLE PRECISION, 0) + p_weight)
+        );
+    END LOOP;
+
+    UPDATE user_preference_profiles SET
+        category_weights = profile.category_weights,
+        label_weights = profile.label_weights,
+        spec_weights = profile.spec_weights,
+        price_weight = profile.price_weight + p_weight,
+        price_sum = profile.price_sum + p_weight * p_price,
+        price_sq_sum = profile.price_sq_sum + p_weight * p_price * p_price,
+        event_count = profile.event_count + p_events,
+        decay_epoch = profile.decay_epoch,
+        updated_at = TIMEZONE('utc', NOW())
+    WHERE user_id = p_user_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Apply a batch of coalesced preference events in one call. Users are
+-- visited in id order so concurrent batches lock profiles consistently.
+DROP FUNCTION IF EXISTS record_preference_events(JSONB);
+CREATE OR REPLACE FUNCTION record_preference_events(p_events JSONB, p_tau DOUBLE PRECISION) RETURNS VOID AS $$
+DECLARE
+    event RECORD;
+BEGIN
+    FOR event IN
+        SELECT * FROM jsonb_to_recordset(p_events) AS e(
+            user_id INTEGER,
+            category_id INTEGER,
+            labels TEXT[],
+            specs JSONB,
+            price DOUBLE PRECISION,
+            weight DOUBLE PRECISION,
+            events INTEGER,
+            at TIMESTAMP WITH TIME ZONE
+        )
+        ORDER BY user_id
+    LOOP
+        PERFORM record_preference_event(
+            event.user_id, event.category_id, event.labels, event.specs,
+            event.price, event.weight, event.events, event.at, p_tau
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Apply a batch of coalesced product views, adding each (user, product)
+-- pair's views to its stored count and keeping the latest view time
+CREATE OR REPLACE FUNCTION record_product_views(p_views JSONB) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO user_views (user_id, product_id, view_count, viewed_at)
+    SELECT v.user_id, v.product_id, v.view_count, v.viewed_at
+    FROM jsonb_to_recordset(p_views) AS v(
+        user_id INTEGER,
+        product_id INTEGER,
+        view_count INTEGER,
+        viewed_at TIMESTAMP WITH TIME ZONE
+    )
+    ORDER BY v.user_id, v.product_id
+    ON CONFLICT (user_id, product_id) DO UPDATE SET
+        view_count = user_views.view_count + EXCLUDED.view_count,
+        viewed_at = GREATEST(user_views.viewed_at, EXCLUDED.viewed_at);
+END;
+$$ LANGUAGE plpgsql;
+
+-- The interaction tables are created outside this script. Make sure they
+-- carry the write times similarity builds read them incrementally by.
+ALTER TABLE IF EXISTS user_purchases ADD COLUMN IF NOT EXISTS id BIGSERIAL;
+ALTER TABLE IF EXISTS user_purchases
+    ADD COLUMN IF NOT EXISTS purchased_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+DO $$
+BEGIN
+    IF to_regclass('user_views') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS idx_user_views_viewed_at
+            ON user_views(viewed_at, user_id, product_id);
+    END IF;
+    IF to_regclass('user_purchases') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS idx_user_purchases_purchased_at
+            ON user_purchases(purchased_at, id);
+    END IF;
+END;
+$$;
@@ -0,0 +1,66 @@
+"""Tests for the in-process catalog snapshot."""
+import asyncio
+from datetime import datetime
+from typing import List
+from app.models.product import Product
+from app.services.catalog_cache import CatalogCache
+
+def make_product(product_id: int, price: float = 1.0) -> Product:
+    """Build a product with the given id and price."""
+    now = datetime(2024, 1, 1)
+    return Product(
+        id=product_id,
+        name=f'Product {product_id}',
+        description='',
+        price=price,
+        stock=1,
+        category_id=1,
+        labels=[],
+        specs={},
+        created_at=now,
+        updated_at=now
+    )
+
+def blocked_loader(products: List[Product], started: asyncio.Event, release: asyncio.Event):
+    """Build a loader that returns products once released."""
+    async def load() -> List[Product]:
+        started.set()
+        await release.wait()
+        return list(products)
+    return load
+
+def released() -> asyncio.Event:
+    """Build an event that is already set."""
+    event = asyncio.Event()
+    event.set()
+    return event
+
+async def load_with_write(cache: CatalogCache, products: List[Product], write) -> None:
+    """Run a foreground load and make a local write while it is in flight."""
+    started, release = asyncio.Event(), asyncio.Event()
+    load = asyncio.ensure_future(cache.get(blocked_loader(products, started, release)))
+    await started.wait()
+    write()
+    release.set()
+    await load
+
+def test_put_during_cold_load_is_kept():
+    """A product written while the first load runs replaces the loaded row."""
+    cache = CatalogCache(ttl=60)
+
+    asyncio.run(load_with_write(cache, [make_product(1)], lambda: cache.put(make_product(1, 2.0))))
+
+    assert {i: p.price for i, p in cache.snapshot.products.items()} == {1: 2.0}
+
+def test_remove_during_reload_is_kept():
+    """A product removed while a reload runs stays removed, even if new to the snapshot."""
+    cache = CatalogCache(ttl=60)
+
+    async def scenario():
+        await cache.get(blocked_loader([make_product(1)], asyncio.Event(), released()))
+        cache.invalidate()
+        await load_with_write(cache, [make_product(1), make_product(7)], lambda: cache.remove(7))
+
+    asyncio.run(scenario())
+
+    assert sorted(cache.snapshot.products) == [1]
@@ -0,0 +1,113 @@
+"""Tests for vectorized content scoring."""
+import random
+from datetime import datetime
+from typing import Dict
+import numpy as np
+from app.models.product import Product
+from app.services.ai_recommendation_service import calculate_content_scores
+from app.services.catalog_columns import SCORING_ARRAYS, CatalogColumns
+from app.services.model_store import load_arrays, publish_arrays
+
+LABELS = ['gaming', 'office', 'portable', 'budget', 'premium']
+SPECS = {'color': ['black', 'white', 'silver'], 'ram': ['8GB', '16GB'], 'size': ['13', '15']}
+
+def scalar_score(preferences: Dict, columns: CatalogColumns, row: int) -> float:
+    """Score one catalog row with the per-product content rules."""
+    score = 0.0
+
+    # Category matching
+    if preferences.get('preferred_categories'):
+        if columns.category[row] in preferences['preferred_categories']:
+            score += 0.3
+
+    # Label matching
+    if preferences.get('preferred_labels'):
+        matching_labels = set(columns.labels_of(row)).intersection(
+            set(preferences['preferred_labels'])
+        )
+        score += len(matching_labels) * 0.2
+
+    # Price range matching
+    if preferences.get('price_range'):
+        min_price, max_price = preferences['price_range']
+        if min_price <= columns.price[row] <= max_price:
+            score += 0.2
+
+    # Specs matching
+    if preferences.get('preferred_specs'):
+        specs = columns.specs_of(row)
+        for spec_key, spec_value in preferences['preferred_specs'].items():
+            if specs.get(spec_key) == spec_value:
+                score += 0.1
+
+    return min(score, 1.0)
+
+def make_catalog(rng: random.Random, count: int) -> CatalogColumns:
+    """Build a column store of random products."""
+    now = datetime(2024, 1, 1)
+    products = []
+    for product_id in range(1, count + 1):
+        spec_keys = rng.sample(sorted(SPECS), rng.randint(0, len(SPECS)))
+        products.append(Product(
+            id=product_id,
+            name=f'Product {product_id}',
+            description='x' * rng.randint(0, 50),
+            price=round(rng.uniform(5, 500), 2),
+            stock=rng.randint(0, 20),
+            category_id=rng.choice([1, 2, 3]),
+            labels=rng.sample(LABELS, rng.randint(0, 3)),
+            specs={key: rng.choice(SPECS[key]) for key in spec_keys},
+            created_at=now,
+            updated_at=now
+        ))
+    return CatalogColumns.from_products(products)
+
+def make_preferences(rng: random.Random) -> Dict:
+    """Build random preferences, including labels and specs absent from the catalog."""
+    if rng.random() < 0.1:
+        return {}
+    low = rng.uniform(0, 300)
+    return {
+        'preferred_categories': rng.sample([1, 2, 3, 4], rng.randint(0, 2)),
+        'preferred_labels': rng.sample(LABELS + ['unknown'], rng.randint(0, 3)),
+        'price_range': (low, low + rng.uniform(0, 200)),
+        'preferred_specs': {
+            key: rng.choice(SPECS.get(key, []) + ['missing'])
+            for key in rng.sample(sorted(SPECS) + ['weight'], rng.randint(0, 3))
+        }
+    }
+
+def test_content_scores_match_scalar_rules():
+    """Every vectorized score equals the scalar rule for the same row."""
+    rng = random.Random(7)
+    columns = make_catalog(rng, 60)
+    profiles = [make_preferences(rng) for _ in range(40)]
+
+    scores = calculate_content_scores(profiles, columns)
+
+    expected = np.array([
+        [scalar_score(preferences, columns, row) for row in range(columns.size)]
+        for preferences in profiles
+    ])
+    assert scores.shape == (len(profiles), columns.size)
+    assert np.array_equal(scores, expected)
+
+def test_content_scores_of_empty_catalog():
+    """Scoring an empty catalog gives one empty row per profile."""
+    scores = calculate_content_scores([{}, {'preferred_labels': ['gaming']}], CatalogColumns())
+    assert scores.shape == (2, 0)
+
+def test_published_columns_score_the_same(tmp_path):
+    """Columns mapped back from published arrays give the same scores."""
+    rng = random.Random(11)
+    columns = make_catalog(rng, 30)
+    profiles = [make_preferences(rng) for _ in range(10)]
+
+    version = publish_arrays(tmp_path, columns.scoring_arrays()).name
+    arrays = load_arrays(tmp_path, version, SCORING_ARRAYS)
+    published = CatalogColumns.from_scoring_arrays(dict(zip(SCORING_ARRAYS, arrays)))
+
+    assert np.array_equal(
+        calculate_content_scores(profiles, published),
+        calculate_content_scores(profiles, columns)
+    )